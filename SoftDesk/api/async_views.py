@@ -0,0 +1,207 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import PermissionDenied
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.exceptions import InvalidToken
+from api.authentication import StatelessJWTAuthentication, get_user_cache
+from api.fieldsets import TRUE_VALUES
+from api.instrumentation import measure
+from api.membership import aget_membership
+from api.models import User, Project, Issue, Comment
+from api.serializers import (
+    ProjectListSerializer,
+    ProjectDetailSerializer,
+    IssueListSerializer,
+    IssueDetailSerializer,
+    CommentListSerializer,
+    CommentDetailSerializer,
+    IssueFilterSerializer,
+)
+from api.views import filter_issues
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type="application/json", status=status)
+
+
+class AsyncReadView(View):
+    """
+    Base of the native async views serving the read-heavy endpoints under ASGI.
+    Authentication, permission checks and queries are awaited, with the async ORM,
+    so that one ASGI worker serves many concurrent requests without a thread per request.
+    Responses are the same as the ones of the viewsets' list and retrieve actions with the page number
+    pagination, ?fields= and ?compact=. The query parameters of the other modes (cursor pagination, counts
+    of contributors) are rejected with a 400 response, and conditional requests (ETag) are not supported:
+    the responses are always complete.
+    """
+    http_method_names = ["get", "head", "options"]
+    serializer_class = None
+    many = False
+    page_size = api_settings.PAGE_SIZE
+    # query parameters of the viewsets that the async views do not support.
+    unsupported_params = ("pagination", "cursor", "contributors")
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            with measure("auth"):
+                request.user = await self.authenticate(request)
+            if request.user is None:
+                return json_response({"detail": "Authentication credentials were not provided."}, status=401)
+            with measure("perm"):
+                await self.check_permissions(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except (AuthenticationFailed, InvalidToken) as exc:
+            return json_response({"detail": exc.detail}, status=401)
+        except PermissionDenied as exc:
+            return json_response({"detail": str(exc)}, status=403)
+        except Http404:
+            return json_response({"detail": "Not found."}, status=404)
+        except ValidationError as exc:
+            return json_response(exc.detail, status=400)
+
+    @staticmethod
+    async def authenticate(request):
+        authentication = StatelessJWTAuthentication()
+        if get_user_cache() is None:
+            # the user is built from the token: no database query.
+            result = authentication.authenticate(request)
+        else:
+            result = await sync_to_async(authentication.authenticate)(request)
+        return result[0] if result is not None else None
+
+    async def check_permissions(self, request):
+        """
+        Raises PermissionDenied if the user cannot access the view.
+        """
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def check_query_params(self, request):
+        # ?pagination=page is the only pagination of the async views.
+        unsupported = sorted(
+            param for param in self.unsupported_params
+            if param in request.GET and (param, request.GET[param]) != ("pagination", "page")
+        )
+        if unsupported:
+            message = "Not supported by the async endpoints, use the /api/projects/ ones."
+            raise ValidationError({param: [message] for param in unsupported})
+
+    def get_serializer(self, instance, many=False):
+        """
+        Returns the serializer of the requested fields (?fields=, ?compact=), as SparseFieldsetMixin does.
+        """
+        requested = {name.strip() for name in self.request.GET.get("fields", "").split(",") if name.strip()}
+        if requested:
+            unknown = sorted(requested - set(self.serializer_class().fields))
+            if unknown:
+                raise ValidationError({"fields": [f"Unknown fields: {', '.join(unknown)}."]})
+        return self.serializer_class(
+            instance, many=many, context={"request": self.request}, fields=requested or None,
+            compact=self.request.GET.get("compact", "").lower() in TRUE_VALUES,
+        )
+
+    async def get(self, request, *args, **kwargs):
+        self.check_query_params(request)
+        if not self.many:
+            instance = await self.get_queryset().filter(pk=kwargs["pk"]).afirst()
+            if instance is None:
+                raise Http404
+            with measure("ser"):
+                return json_response(self.get_serializer(instance).data)
+
+        page, data = await self.paginate(request, self.get_queryset())
+        with measure("ser"):
+            data["results"] = self.get_serializer(page, many=True).data
+            return json_response(data)
+
+    async def paginate(self, request, queryset):
+        try:
+            page_number = int(request.GET.get("page", 1))
+        except ValueError:
+            raise Http404
+        count = await queryset.acount()
+        last_page = max(1, -(-count // self.page_size))
+        if page_number < 1 or page_number > last_page:
+            raise Http404
+
+        offset = (page_number - 1) * self.page_size
+        page = [obj async for obj in queryset[offset:offset + self.page_size]]
+
+        url = request.build_absolute_uri()
+        next_url = replace_query_param(url, "page", page_number + 1) if page_number < last_page else None
+        if page_number == 1:
+            previous_url = None
+        elif page_number == 2:
+            previous_url = remove_query_param(url, "page")
+        else:
+            previous_url = replace_query_param(url, "page", page_number - 1)
+        return page, {"count": count, "next": next_url, "previous": previous_url}
+
+
+class ProjectContributorAsyncMixin:
+    """
+    Async counterpart of the IsProjectContributor permission.
+    """
+
+    async def check_permissions(self, request):
+        membership = await aget_membership(request, self.kwargs["project_pk"])
+        if not membership.is_contributor:
+            raise PermissionDenied("You have to be a project contributor to access.")
+
+
+class AsyncProjectListView(AsyncReadView):
+    serializer_class = ProjectListSerializer
+    many = True
+
+    def get_queryset(self):
+        return (
+            Project.objects.filter(contributors=self.request.user.pk)
+            .prefetch_related(Prefetch("contributors", queryset=User.objects.only("id")))
+            .order_by("created_time")
+        )
+
+
+class AsyncProjectDetailView(AsyncProjectListView):
+    serializer_class = ProjectDetailSerializer
+    many = False
+
+
+class AsyncIssueListView(ProjectContributorAsyncMixin, AsyncReadView):
+    serializer_class = IssueListSerializer
+    many = True
+
+    def get_queryset(self):
+        issues = Issue.objects.filter(project_id=self.kwargs["project_pk"])
+        if not self.many:
+            return issues
+        # ?state=, ?priority=, ?tag=, ?assignee=, ?author= and ?ordering=, as IssueViewSet.
+        serializer = IssueFilterSerializer(data=self.request.GET)
+        serializer.is_valid(raise_exception=True)
+        return filter_issues(issues, serializer.validated_data)
+
+
+class AsyncIssueDetailView(AsyncIssueListView):
+    serializer_class = IssueDetailSerializer
+    many = False
+
+
+class AsyncCommentListView(ProjectContributorAsyncMixin, AsyncReadView):
+    serializer_class = CommentListSerializer
+    many = True
+
+    def get_queryset(self):
+        return Comment.objects.filter(
+            issue_id=self.kwargs["issue_pk"], issue__project_id=self.kwargs["project_pk"],
+            issue__deleted_time__isnull=True,
+        ).order_by("created_time")
+
+
+class AsyncCommentDetailView(AsyncCommentListView):
+    serializer_class = CommentDetailSerializer
+    many = False
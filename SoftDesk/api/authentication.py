@@ -0,0 +1,78 @@
+import copy
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from api.lru import TimedLRUCache
+from api.metrics import record_auth_failure
+
+# Default settings of the users cache, overridden by settings.JWT_USER_CACHE.
+JWT_USER_CACHE_DEFAULTS = {
+    # False: request.user is a TokenUser built from the token claims, without any query.
+    # True: request.user is the User model instance, kept in an in-process cache for TIMEOUT seconds.
+    "ENABLED": False,
+    "MAX_ENTRIES": 10000,
+    "TIMEOUT": 30,
+}
+
+_user_cache = None
+
+
+def get_user_cache():
+    global _user_cache
+
+    options = {**JWT_USER_CACHE_DEFAULTS, **getattr(settings, "JWT_USER_CACHE", {})}
+    if not options["ENABLED"]:
+        return None
+    if _user_cache is None:
+        _user_cache = TimedLRUCache(options["MAX_ENTRIES"], options["TIMEOUT"])
+    return _user_cache
+
+
+def reset_user_cache(setting="JWT_USER_CACHE", **kwargs):
+    """
+    Drop the users cache, so that it is built again from the settings.
+    """
+    global _user_cache
+
+    if setting == "JWT_USER_CACHE":
+        _user_cache = None
+
+
+def invalidate_cached_user(user_id):
+    cache = get_user_cache()
+    if cache is not None:
+        cache.delete(user_id)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication without a User query per request.
+    By default, request.user is a TokenUser built from the claims of the token (id, username, is_superuser),
+    added at login by ClaimsTokenObtainPairSerializer: views must use request.user.pk, not the instance.
+    With settings.JWT_USER_CACHE["ENABLED"], request.user is the User instance, fetched once per TIMEOUT seconds.
+    As with any stateless token, a deactivated user keeps access until the access token expires.
+    """
+
+    def authenticate(self, request):
+        try:
+            return super().authenticate(request)
+        except AuthenticationFailed as exc:
+            # InvalidToken too, e.g. an expired token.
+            record_auth_failure(exc.default_code)
+            raise
+
+    def get_user(self, validated_token):
+        cache = get_user_cache()
+        if cache is None:
+            return super().get_user(validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = cache.get(user_id)
+        if user is None:
+            # one query, with the checks of the default authentication (user exists and is active).
+            user = JWTAuthentication.get_user(self, validated_token)
+            cache.set(user_id, user)
+        # each request gets its own copy of the cached instance.
+        return copy.copy(user)
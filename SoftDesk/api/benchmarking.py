@@ -0,0 +1,97 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from api.models import User, Project, Issue, Comment
+from api.counters import repair_counters
+from api.search import rebuild_index
+from api.serializers import ClaimsTokenObtainPairSerializer
+from api.stats import counters_enabled, rebuild_counters
+
+
+@contextmanager
+def benchmark_database(on_disk=False):
+    """
+    Runs the benchmarks against a test database, created and destroyed around the block,
+    so that the seeded data never reaches the configured database.
+    With on_disk, an SQLite test database is a file, as the configured one, instead of being in memory.
+    The instrumentation does not log the benchmarked requests.
+    """
+    test_settings = connection.settings_dict["TEST"]
+    old_test_name = test_settings.get("NAME")
+    with tempfile.TemporaryDirectory() as directory:
+        if on_disk and connection.vendor == "sqlite" and not old_test_name:
+            test_settings["NAME"] = os.path.join(directory, "benchmark.sqlite3")
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(INSTRUMENTATION={**getattr(settings, "INSTRUMENTATION", {}), "LOG": False}):
+                yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            test_settings["NAME"] = old_test_name
+
+
+def seed(users=None, projects=5, contributors=5, issues=50, comments=5):
+    """
+    Creates users, then projects with their contributors, issues and comments, with bulk inserts.
+    Each project has contributors contributors (its author included), taken in turn from the users.
+    Returns the author of every project, who is also a contributor of each one.
+    """
+    users = [
+        User(username=f"bench-{index}", email=f"bench-{index}@example.com", age=30)
+        for index in range(max(1, users or contributors))
+    ]
+    for user in users:
+        # a usable password is not needed: the benchmarks authenticate with tokens.
+        user.set_unusable_password()
+    User.objects.bulk_create(users)
+    author = users[0]
+
+    project_objs = Project.objects.bulk_create(
+        Project(name=f"Project {index}", description="Benchmark project", type=Project.BACKEND, author=author)
+        for index in range(projects)
+    )
+    others = users[1:]
+    memberships = set()
+    for index, project in enumerate(project_objs):
+        memberships.add((project.pk, author.pk))
+        for offset in range(min(len(others), max(0, contributors - 1))):
+            memberships.add((project.pk, others[(index + offset) % len(others)].pk))
+    Project.contributors.through.objects.bulk_create(
+        Project.contributors.through(project_id=project_id, user_id=user_id) for project_id, user_id in memberships
+    )
+    issue_objs = Issue.objects.bulk_create(
+        (
+            Issue(
+                name=f"Issue {index}", description="Benchmark issue", project=project, author=author,
+                assignee=users[index % len(users)], tag=Issue.TAGS[index % len(Issue.TAGS)][0],
+                state=Issue.STATES[index % len(Issue.STATES)][0],
+                priority=Issue.PRIORITIES[index % len(Issue.PRIORITIES)][0],
+            )
+            for project in project_objs for index in range(issues)
+        ),
+        batch_size=500,
+    )
+    Comment.objects.bulk_create(
+        (
+            Comment(name=f"Comment {index}", description="Benchmark comment", issue=issue, author=author)
+            for issue in issue_objs for index in range(comments)
+        ),
+        batch_size=500,
+    )
+    # the rows are bulk inserted, without the signals maintaining the counters and the search index.
+    repair_counters()
+    rebuild_index()
+    if counters_enabled():
+        rebuild_counters()
+    return author
+
+
+def access_token(user):
+    return str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
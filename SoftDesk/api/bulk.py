@@ -0,0 +1,159 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from api.response_cache import invalidate_scopes
+from api.search import index_objects
+
+
+class BulkActionMixin:
+    """
+    Adds a /bulk/ action to a nested viewset, creating (POST) or updating (PATCH) a list of objects at once.
+    All the items are validated with a single set of database lookups, then written with bulk_create or
+    bulk_update in one transaction. The response gives the result of each item, in the request order:
+    {"index": 0, "status": 201, "id": 12} or {"index": 1, "status": 400, "errors": {...}}.
+    """
+    bulk_max_items = 10000
+    bulk_batch_size = 500
+
+    # serializer validating the fields of one item, without database lookups.
+    bulk_serializer_class = None
+
+    def get_bulk_lookup_errors(self, items, instances=None):
+        """
+        Validates the items against the database, with a constant number of queries.
+        Returns a dict {index: errors} of the invalid items.
+        """
+        return {}
+
+    # fields of the objects stored in the search index.
+    bulk_search_fields = {"name", "description"}
+
+    def bulk_written(self, instances, fields=None):
+        """
+        Called after the objects have been written: bulk_create and bulk_update do not send the model signals.
+        fields is the set of updated fields, None on creation.
+        """
+        if fields is None or self.bulk_search_fields & fields:
+            index_objects(instances)
+        if hasattr(self, "get_response_cache_scope"):
+            invalidate_scopes(self.get_response_cache_scope()[0])
+
+    def build_bulk_instance(self, attrs):
+        """
+        Returns the unsaved model instance created from the validated attrs of an item.
+        """
+        raise NotImplementedError
+
+    @action(detail=False, methods=["post", "patch"], url_path="bulk")
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise serializers.ValidationError("Expected a non-empty list of items.")
+        if len(items) > self.bulk_max_items:
+            raise serializers.ValidationError(f"A maximum of {self.bulk_max_items} items can be sent at once.")
+
+        if request.method == "POST":
+            return self.bulk_create(items)
+        return self.bulk_update(items)
+
+    def _validate_bulk_items(self, items, partial=False):
+        """
+        Returns the list of validated attrs and the dict {index: errors} of the invalid items.
+        """
+        # one serializer instance validates every item.
+        serializer = self.bulk_serializer_class(context=self.get_serializer_context(), partial=partial)
+        validated, errors = [], {}
+        for index, item in enumerate(items):
+            try:
+                validated.append(serializer.run_validation(item))
+            except serializers.ValidationError as exc:
+                validated.append(None)
+                errors[index] = exc.detail
+        return validated, errors
+
+    @staticmethod
+    def _bulk_response(results, success_status):
+        results.sort(key=lambda result: result["index"])
+        all_succeeded = all(result["status"] == success_status for result in results)
+        return Response(
+            {"results": results},
+            status=success_status if all_succeeded else status.HTTP_207_MULTI_STATUS,
+        )
+
+    def bulk_create(self, items):
+        validated, errors = self._validate_bulk_items(items)
+        valid_items = {index: attrs for index, attrs in enumerate(validated) if attrs is not None}
+        errors.update(self.get_bulk_lookup_errors(valid_items))
+
+        created = {
+            index: self.build_bulk_instance(attrs) for index, attrs in valid_items.items() if index not in errors
+        }
+        model = self.get_queryset().model
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(created.values(), batch_size=self.bulk_batch_size)
+        except IntegrityError:
+            # objects created by a concurrent request since the validation.
+            raise serializers.ValidationError("Some items have been created concurrently, please retry.")
+        if created:
+            self.bulk_written(list(created.values()))
+
+        results = [{"index": index, "status": status.HTTP_400_BAD_REQUEST, "errors": detail}
+                   for index, detail in errors.items()]
+        results += [{"index": index, "status": status.HTTP_201_CREATED, "id": instance.pk}
+                    for index, instance in created.items()]
+        return self._bulk_response(results, status.HTTP_201_CREATED)
+
+    def bulk_update(self, items):
+        validated, errors = self._validate_bulk_items(items, partial=True)
+
+        # the objects to update are fetched with one query.
+        ids = [item.get("id") for item in items if isinstance(item, dict)]
+        instances = self.get_queryset().in_bulk([pk for pk in ids if isinstance(pk, int)])
+
+        valid_items = {}
+        for index, attrs in enumerate(validated):
+            if attrs is None:
+                continue
+            instance = instances.get(items[index].get("id"))
+            if instance is None:
+                errors[index] = {"id": ["Not found."]}
+            elif instance.author_id != self.request.user.pk:
+                errors[index] = {"detail": "You have to be the author to update or delete."}
+            else:
+                valid_items[index] = attrs
+        errors.update(self.get_bulk_lookup_errors(valid_items, instances=instances))
+
+        updated, fields = {}, set()
+        for index, attrs in valid_items.items():
+            if index in errors:
+                continue
+            instance = instances[items[index]["id"]]
+            for field, value in attrs.items():
+                setattr(instance, field, value)
+                fields.add(field)
+            updated[index] = instance
+
+        if updated and fields:
+            model = self.get_queryset().model
+            # bulk_update() does not set the auto_now fields, such as updated_time.
+            now = timezone.now()
+            for field in model._meta.concrete_fields:
+                if getattr(field, "auto_now", False):
+                    for instance in updated.values():
+                        setattr(instance, field.attname, now)
+                    fields.add(field.name)
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_update(updated.values(), fields, batch_size=self.bulk_batch_size)
+            except IntegrityError:
+                raise serializers.ValidationError("The updates would create duplicates, nothing has been updated.")
+            self.bulk_written(list(updated.values()), fields)
+
+        results = [{"index": index, "status": status.HTTP_400_BAD_REQUEST, "errors": detail}
+                   for index, detail in errors.items()]
+        results += [{"index": index, "status": status.HTTP_200_OK, "id": instance.pk}
+                    for index, instance in updated.items()]
+        return self._bulk_response(results, status.HTTP_200_OK)
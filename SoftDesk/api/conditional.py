@@ -0,0 +1,88 @@
+import hashlib
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from api.response_cache import get_response_cache_options, get_scope_version
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified headers to the list and retrieve actions, and answers 304 Not Modified
+    to If-None-Match / If-Modified-Since requests.
+    The ETag of a detail is computed with one query on its updated_time, before any serialization.
+    The ETag of a list comes from the version of its response cache scope (see ResponseCacheMixin), changed on
+    every write of its objects: no query, whatever the page. Without the response cache, it is the hash of the
+    rendered page, which is built but not sent when it did not change.
+    Lists have no Last-Modified header: a deletion does not change the latest updated_time.
+    """
+
+    def get_conditional_queryset(self):
+        """
+        Returns the queryset the validators are computed from, without the prefetches used by serialization.
+        """
+        return self.get_queryset().prefetch_related(None)
+
+    def _make_etag(self, *parts):
+        # the representation also depends on the user, the query parameters and the negotiated format.
+        parts = (self.request.user.pk, self.request.get_full_path(), self.request.accepted_media_type) + parts
+        return quote_etag(hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest())
+
+    def _conditional_response(self, request, etag, last_modified, render):
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def _list_version(self):
+        """
+        Returns the version of the response cache scope of the list, or None without the response cache.
+        """
+        options = get_response_cache_options()
+        if not options["ENABLED"] or not hasattr(self, "get_response_cache_scope"):
+            return None
+        return get_scope_version(caches[options["CACHE_ALIAS"]], self.get_response_cache_scope()[0])
+
+    def list(self, request, *args, **kwargs):
+        version = self._list_version()
+        if version is not None:
+            # read before the database, as the response cache does.
+            return self._conditional_response(
+                request, self._make_etag(version), None,
+                lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+            )
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            def validate(rendered):
+                rendered["ETag"] = self._make_etag(hashlib.md5(rendered.content, usedforsecurity=False).hexdigest())
+                return get_conditional_response(request._request, etag=rendered["ETag"], response=rendered)
+
+            response.add_post_render_callback(validate)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        try:
+            updated_time = (
+                self.get_conditional_queryset().order_by().filter(**lookup)
+                .values_list("updated_time", flat=True).first()
+            )
+        except (TypeError, ValueError, ValidationError):
+            # malformed lookup, e.g. /issues/abc/.
+            updated_time = None
+        if updated_time is None:
+            # not found: the usual 404 response.
+            return super().retrieve(request, *args, **kwargs)
+
+        # HTTP dates have a precision of one second.
+        last_modified = int(updated_time.timestamp())
+        etag = self._make_etag(lookup, updated_time)
+        return self._conditional_response(
+            request, etag, last_modified, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
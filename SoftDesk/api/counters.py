@@ -0,0 +1,86 @@
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from api.models import Project, Issue, Comment
+from api.response_cache import invalidate_scopes, project_scope, user_scope
+
+
+def _contributor_scopes(project_ids):
+    user_ids = set(
+        Project.contributors.through.objects.filter(project_id__in=project_ids).values_list("user_id", flat=True)
+    )
+    return [user_scope(user_id) for user_id in user_ids]
+
+
+def comments_written(issue_id, added=0):
+    """
+    Adds added (negative for deletions) to the comment_count of an issue and, for a new or edited comment,
+    moves its last_activity. updated_time changes too, so that the issues lists are not served from caches.
+    """
+    now = timezone.now()
+    changes = {"updated_time": now}
+    if added:
+        changes["comment_count"] = F("comment_count") + added
+    if added >= 0:
+        changes["last_activity"] = now
+    Issue.objects.filter(pk=issue_id).update(**changes)
+    project_ids = Issue.objects.filter(pk=issue_id).values_list("project_id", flat=True)
+    invalidate_scopes(*[project_scope(project_id) for project_id in project_ids])
+
+
+def issues_written(project_id, added):
+    """
+    Adds added (negative for deletions) to the issue_count of a project.
+    """
+    Project.objects.filter(pk=project_id).update(issue_count=F("issue_count") + added, updated_time=timezone.now())
+    invalidate_scopes(*_contributor_scopes([project_id]))
+
+
+def _count(queryset, column):
+    return Coalesce(
+        Subquery(queryset.order_by().values(column).annotate(count=Count("*")).values("count")),
+        0,
+        output_field=IntegerField(),
+    )
+
+
+def _chunks(ids, size=500):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def repair_counters():
+    """
+    Computes the counters again from the comments and issues, fixing the rows that drifted:
+    issue_count, comment_count, and last_activity when it is older than the latest comment.
+    Returns the numbers of repaired issues and projects.
+    """
+    now = timezone.now()
+    comments = Comment.objects.filter(issue_id=OuterRef("pk"))
+    actual_count = _count(comments, "issue_id")
+    latest_comment = Subquery(
+        comments.order_by().values("issue_id").annotate(latest=Max("created_time")).values("latest")
+    )
+    actual_activity = Greatest(F("last_activity"), Coalesce(latest_comment, F("created_time")))
+    drifted = Issue.objects.annotate(actual_count=actual_count, actual_activity=actual_activity).filter(
+        ~Q(comment_count=F("actual_count")) | ~Q(last_activity=F("actual_activity"))
+    )
+    issues = list(drifted.values_list("pk", "project_id"))
+    for chunk in _chunks([pk for pk, project_id in issues]):
+        Issue.objects.filter(pk__in=chunk).update(
+            comment_count=actual_count, last_activity=actual_activity, updated_time=now
+        )
+
+    actual_issue_count = _count(Issue.objects.filter(project_id=OuterRef("pk")), "project_id")
+    projects = list(
+        Project.objects.annotate(actual_count=actual_issue_count)
+        .exclude(issue_count=F("actual_count"))
+        .values_list("pk", flat=True)
+    )
+    for chunk in _chunks(projects):
+        Project.objects.filter(pk__in=chunk).update(issue_count=actual_issue_count, updated_time=now)
+
+    invalidate_scopes(
+        *{project_scope(project_id) for pk, project_id in issues}, *_contributor_scopes(projects)
+    )
+    return len(issues), len(projects)
@@ -0,0 +1,35 @@
+from django.conf import settings
+
+# Default pragmas of the SQLite connections, overridden by settings.SQLITE_PRAGMAS.
+SQLITE_PRAGMAS_DEFAULTS = {
+    # persisted in the database file, so only changed when set: "WAL" lets the readers and the writer
+    # run concurrently.
+    "journal_mode": None,
+    # in WAL mode, "NORMAL" only syncs at checkpoints: a power loss can lose the last commits, never corrupt.
+    # None keeps SQLite's FULL.
+    "synchronous": None,
+    # bytes of the database file read through a memory map instead of read() calls.
+    "mmap_size": 256 * 1024 * 1024,
+    # page cache of each connection, in KiB when negative.
+    "cache_size": -64 * 1024,
+    # milliseconds a connection waits for a lock before failing with "database is locked".
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+
+def get_sqlite_pragmas():
+    return {**SQLITE_PRAGMAS_DEFAULTS, **getattr(settings, "SQLITE_PRAGMAS", {})}
+
+
+def configure_connection(connection):
+    """
+    Tunes a new database connection. SQLite pragmas are per connection (journal_mode is persisted in the file),
+    so they are set on every connect; the in-memory test databases keep their "memory" journal.
+    """
+    if connection.vendor != "sqlite":
+        return
+    for pragma, value in get_sqlite_pragmas().items():
+        if value is not None:
+            # on the sqlite3 connection: the pragmas are not counted as queries of the request.
+            connection.connection.execute(f"PRAGMA {pragma} = {value}")
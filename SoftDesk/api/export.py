@@ -0,0 +1,52 @@
+from django.db.models import Prefetch
+from api.models import Issue, Comment
+from api.renderers import CSVRenderer, NDJSONRenderer
+
+ISSUE_FIELDS = ["id", "name", "description", "tag", "state", "priority", "author_id", "assignee_id", "created_time"]
+COMMENT_FIELDS = ["id", "name", "description", "author_id", "created_time"]
+CSV_COLUMNS = ["type", "id", "issue_id", "name", "description", "tag", "state", "priority", "author_id",
+               "assignee_id", "created_time"]
+
+
+def iter_project_issues(project, chunk_size):
+    """
+    Yields the issues of the project with their comments prefetched, using a server-side cursor.
+    Comments are fetched with one query per chunk of issues, so that memory stays bounded by chunk_size.
+    """
+    comments = Comment.objects.only("issue_id", *COMMENT_FIELDS).order_by("created_time", "id")
+    issues = (
+        Issue.objects.filter(project=project)
+        .only(*ISSUE_FIELDS)
+        .order_by("created_time", "id")
+        .prefetch_related(Prefetch("comments", queryset=comments))
+    )
+    return issues.iterator(chunk_size=chunk_size)
+
+
+def export_ndjson(project, chunk_size):
+    """
+    Yields one JSON line per issue, with its comments nested.
+    """
+    for issue in iter_project_issues(project, chunk_size):
+        data = {field: getattr(issue, field) for field in ISSUE_FIELDS}
+        data["comments"] = [
+            {field: getattr(comment, field) for field in COMMENT_FIELDS} for comment in issue.comments.all()
+        ]
+        yield NDJSONRenderer.render_line(data)
+
+
+def export_csv(project, chunk_size):
+    """
+    Yields a header then one CSV row per issue, each issue being followed by the rows of its comments.
+    """
+    yield CSVRenderer.render_row(CSV_COLUMNS)
+    for issue in iter_project_issues(project, chunk_size):
+        yield CSVRenderer.render_row(
+            ["issue", issue.id, "", issue.name, issue.description, issue.tag, issue.state, issue.priority,
+             issue.author_id, issue.assignee_id, issue.created_time.isoformat()]
+        )
+        for comment in issue.comments.all():
+            yield CSVRenderer.render_row(
+                ["comment", comment.id, issue.id, comment.name, comment.description, "", "", "",
+                 comment.author_id, "", comment.created_time.isoformat()]
+            )
@@ -0,0 +1,78 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+class SparseFieldsetMixin:
+    """
+    Lets the clients choose the fields of the list and detail representations with ?fields=id,name,...
+    Only the columns of these fields are selected, with QuerySet.only(), and the serializers
+    (see SparseFieldsSerializerMixin) skip the others. ?compact=true drops the hyperlinks.
+    """
+    sparse_fieldset_actions = ("list", "retrieve")
+
+    _sparse_fields = None
+
+    @property
+    def sparse_fields(self):
+        """
+        Returns the set of requested fields, or None if ?fields= is not given.
+        Unknown fields are rejected with a 400 response.
+        """
+        if self.action not in self.sparse_fieldset_actions:
+            return None
+        if self._sparse_fields is None:
+            requested = [name.strip() for name in self.request.query_params.get("fields", "").split(",")]
+            requested = {name for name in requested if name}
+            if requested:
+                unknown = sorted(requested - set(self._serializer_fields()))
+                if unknown:
+                    raise serializers.ValidationError({"fields": [f"Unknown fields: {', '.join(unknown)}."]})
+            self._sparse_fields = requested
+        return self._sparse_fields or None
+
+    def _serializer_fields(self):
+        if not hasattr(self, "_available_fields"):
+            self._available_fields = self.get_serializer_class()().fields
+        return self._available_fields
+
+    @property
+    def compact(self):
+        return (
+            self.action in self.sparse_fieldset_actions
+            and self.request.query_params.get("compact", "").lower() in TRUE_VALUES
+        )
+
+    def wants_field(self, name):
+        fields = self.sparse_fields
+        return fields is None or name in fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.sparse_fieldset_actions:
+            kwargs.setdefault("fields", self.sparse_fields)
+            kwargs.setdefault("compact", self.compact)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.sparse_fields
+        if fields is None:
+            return queryset
+
+        # the primary key (urls, lookups) and the ordering columns (cursor pagination) are always loaded.
+        names = {queryset.model._meta.pk.name}
+        names.update(name.lstrip("-") for name in queryset.query.order_by if isinstance(name, str))
+        names.update(field.source for name, field in self._serializer_fields().items() if name in fields)
+        return queryset.only(*self._concrete_fields(queryset.model, names))
+
+    @staticmethod
+    def _concrete_fields(model, names):
+        for name in names:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                # annotations, properties and the whole object (source="*" of the hyperlinks).
+                continue
+            if field.concrete:
+                yield field.name
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+
+# Default costs, overridden by settings.PASSWORD_HASHING.
+PASSWORD_HASHING_DEFAULTS = {
+    "SCRYPT_WORK_FACTOR": 2 ** 14,
+    "ARGON2_TIME_COST": 2,
+    "ARGON2_MEMORY_COST": 65536,
+    "ARGON2_PARALLELISM": 1,
+}
+
+
+def get_hashing_option(name):
+    return getattr(settings, "PASSWORD_HASHING", {}).get(name, PASSWORD_HASHING_DEFAULTS[name])
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    Scrypt hasher whose cost is set in settings.PASSWORD_HASHING.
+    Hashes keep the "scrypt" algorithm name: when the cost changes, passwords are rehashed at login.
+    """
+
+    @property
+    def work_factor(self):
+        return get_hashing_option("SCRYPT_WORK_FACTOR")
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2 hasher whose costs are set in settings.PASSWORD_HASHING. Requires the argon2-cffi package.
+    """
+
+    @property
+    def time_cost(self):
+        return get_hashing_option("ARGON2_TIME_COST")
+
+    @property
+    def memory_cost(self):
+        return get_hashing_option("ARGON2_MEMORY_COST")
+
+    @property
+    def parallelism(self):
+        return get_hashing_option("ARGON2_PARALLELISM")
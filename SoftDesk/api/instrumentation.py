@@ -0,0 +1,319 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from api.metrics import record_request
+
+logger = logging.getLogger(__name__)
+
+# Default settings of the request instrumentation, overridden by settings.INSTRUMENTATION.
+INSTRUMENTATION_DEFAULTS = {
+    "ENABLED": True,
+    # adds the timings to the responses in a Server-Timing header (shown by the browsers' developer tools).
+    "SERVER_TIMING": True,
+    # logs one JSON line per request, at the INFO level of the api.instrumentation logger.
+    "LOG": True,
+    # number of the latest requests of each route the histograms are computed from.
+    "WINDOW": 1000,
+    # upper bounds, in milliseconds, of the histograms' buckets.
+    "BUCKETS": (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+}
+
+# phases of a request, in the order of the Server-Timing header. db overlaps the other ones.
+PHASES = ("auth", "perm", "db", "ser")
+
+# timings of the request being handled, reached by the database wrappers of any connection.
+_current_timings = ContextVar("request_timings", default=None)
+
+
+def get_instrumentation_options():
+    return {**INSTRUMENTATION_DEFAULTS, **getattr(settings, "INSTRUMENTATION", {})}
+
+
+class RequestTimings:
+    """
+    Durations (in seconds) of the phases of a request, and its number of queries.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = None
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        # (sql, seconds) of each query, when collected (e.g. by the profiler).
+        self.statements = None
+
+    @contextmanager
+    def measure(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[phase] += time.perf_counter() - start
+
+    def stop(self):
+        self.total = time.perf_counter() - self.start
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total * 1000, 3),
+            **{f"{phase}_ms": round(duration * 1000, 3) for phase, duration in self.durations.items()},
+            "queries": self.queries,
+        }
+
+    def server_timing(self):
+        metrics = [f"total;dur={self.total * 1000:.2f}"]
+        for phase, duration in self.durations.items():
+            metric = f"{phase};dur={duration * 1000:.2f}"
+            if phase == "db":
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+def current_timings():
+    return _current_timings.get()
+
+
+@contextmanager
+def request_timings():
+    """
+    Yields the timings of the current request, measuring the block with new timings if it is not instrumented.
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        yield timings
+        return
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def measure(phase):
+    """
+    Context manager adding its duration to a phase of the current request, if it is instrumented.
+    """
+    timings = _current_timings.get()
+    return timings.measure(phase) if timings is not None else nullcontext()
+
+
+def _query_timer(execute, sql, params, many, context):
+    timings = _current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.queries += 1
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        timings.durations["db"] += duration
+        if timings.statements is not None:
+            timings.statements.append((sql, duration))
+
+
+def instrument_connection(connection):
+    """
+    Installs the query timer on a database connection, once: it stays installed, doing nothing
+    outside the instrumented requests. Called for each new connection (the connections are per thread).
+    """
+    if _query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_query_timer)
+
+
+class RouteHistogram:
+    """
+    Rolling histogram of the durations (in milliseconds) of the latest requests of a route.
+    """
+
+    def __init__(self, window, buckets):
+        self.durations = deque(maxlen=window)
+        self.buckets = tuple(buckets)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def observe(self, duration):
+        with self.lock:
+            self.durations.append(duration)
+            self.requests += 1
+
+    def snapshot(self):
+        with self.lock:
+            durations = sorted(self.durations)
+            requests = self.requests
+        counts = [0] * (len(self.buckets) + 1)
+        for duration in durations:
+            counts[bisect_left(self.buckets, duration)] += 1
+
+        def percentile(percent):
+            if not durations:
+                return None
+            return round(durations[min(len(durations) - 1, int(len(durations) * percent / 100))], 3)
+
+        return {
+            "requests": requests,
+            "window": len(durations),
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "max_ms": round(durations[-1], 3) if durations else None,
+            # number of the requests of the window in each bucket: above the previous bound, up to its own.
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], counts)),
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def observe_route(route, duration):
+    histogram = _histograms.get(route)
+    if histogram is None:
+        options = get_instrumentation_options()
+        with _histograms_lock:
+            histogram = _histograms.setdefault(route, RouteHistogram(options["WINDOW"], options["BUCKETS"]))
+    histogram.observe(duration)
+
+
+def route_histograms():
+    """
+    Returns the histograms of the routes served by this process, by route name (e.g. "api:project-issue-list").
+    """
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return {route: histogram.snapshot() for route, histogram in sorted(histograms.items())}
+
+
+def reset_route_histograms():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+class ServerTimingMiddleware:
+    """
+    Measures the api views: total time, authentication, permission checks, database (time and number of queries)
+    and serialization (serializers and rendering). The timings are sent in a Server-Timing header, logged as
+    JSON lines, added to the rolling histogram of the route and to the metrics (api/metrics.py).
+    Should be first in MIDDLEWARE, so that the total time includes the other middlewares.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        options = get_instrumentation_options()
+        if not options["ENABLED"]:
+            return self.get_response(request)
+        token = _current_timings.set(RequestTimings())
+        try:
+            response = self.get_response(request)
+            return self.finish(request, response, options)
+        finally:
+            _current_timings.reset(token)
+
+    async def __acall__(self, request):
+        options = get_instrumentation_options()
+        if not options["ENABLED"]:
+            return await self.get_response(request)
+        token = _current_timings.set(RequestTimings())
+        try:
+            response = await self.get_response(request)
+            return self.finish(request, response, options)
+        finally:
+            _current_timings.reset(token)
+
+    def process_template_response(self, request, response):
+        # the DRF responses are rendered after the middlewares' process_template_response.
+        timings = _current_timings.get()
+        if timings is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                timings.durations["ser"] += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def finish(request, response, options):
+        match = request.resolver_match
+        if match is None or "api" not in match.namespaces:
+            return response
+        timings = _current_timings.get()
+        timings.stop()
+        observe_route(match.view_name, timings.total * 1000)
+        record_request(
+            match.view_name, request.method, response.status_code, timings.total, timings.queries,
+            response.get("X-Response-Cache"),
+        )
+        if options["SERVER_TIMING"]:
+            response["Server-Timing"] = timings.server_timing()
+        if options["LOG"] and logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "route": match.view_name,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                **timings.as_dict(),
+            }))
+        return response
+
+
+class InstrumentedViewMixin:
+    """
+    Adds the authentication, permission checks and serializers of a DRF view to the timings of the request.
+    The serialization of the viewsets' list and retrieve actions is timed from get_serializer() to the use of
+    the serialized data (get_paginated_response() or finalize_response()): nothing else happens in between.
+    """
+    timed_serializer_actions = ("list", "retrieve")
+
+    _serialization_start = None
+
+    def perform_authentication(self, request):
+        with measure("auth"):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with measure("perm"):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with measure("perm"):
+            super().check_object_permissions(request, obj)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if getattr(self, "action", None) in self.timed_serializer_actions and _current_timings.get() is not None:
+            self._serialization_start = time.perf_counter()
+        return serializer
+
+    def _serialized(self):
+        if self._serialization_start is not None:
+            timings = _current_timings.get()
+            if timings is not None:
+                timings.durations["ser"] += time.perf_counter() - self._serialization_start
+            self._serialization_start = None
+
+    def get_paginated_response(self, data):
+        self._serialized()
+        return super().get_paginated_response(data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        self._serialized()
+        return super().finalize_response(request, response, *args, **kwargs)
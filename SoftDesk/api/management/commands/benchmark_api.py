@@ -0,0 +1,335 @@
+import json
+import platform
+import statistics
+import time
+from itertools import count
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from api.benchmarking import access_token, benchmark_database, seed
+from api.models import User, Project, Issue, Comment
+
+LOGIN_PASSWORD = "Benchmark-password-1"
+
+
+class Endpoint:
+    """
+    A request of the benchmark. path and data are callables of the benchmark context and the iteration number,
+    prepare creates the object a request consumes (e.g. deleted) before it is timed.
+    """
+
+    def __init__(self, name, method, path, data=None, prepare=None, status=200):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.prepare = prepare
+        self.status = status
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    """
+    Seeds synthetic data in a test database and drives every route of api/urls.py with the DRF test client,
+    recording per endpoint the number of queries, the p50/p95 latencies and the response size.
+    The response cache is disabled unless --response-cache is given, so that the lists are measured uncached.
+    The results are written as JSON; with --compare, the command fails when the query counts or the
+    latencies regressed beyond the thresholds, compared to a previous run.
+    """
+    help = "Benchmarks the query counts, latencies and response sizes of every API endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="users seeded")
+        parser.add_argument("--projects", type=int, default=10, help="projects seeded")
+        parser.add_argument("--contributors", type=int, default=5, help="contributors per project")
+        parser.add_argument("--issues", type=int, default=50, help="issues per project")
+        parser.add_argument("--comments", type=int, default=5, help="comments per issue")
+        parser.add_argument("--iterations", type=int, default=20, help="timed requests per endpoint")
+        parser.add_argument("--response-cache", action="store_true",
+                            help="keep settings.RESPONSE_CACHE: the lists are then measured as cache hits")
+        parser.add_argument("--only", help="comma separated names of the endpoints to run")
+        parser.add_argument("--output", help="file the JSON results are written to (default: stdout)")
+        parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+        parser.add_argument("--query-threshold", type=int, default=0,
+                            help="extra queries allowed per request before failing the comparison")
+        parser.add_argument("--latency-threshold", type=float, default=0.25,
+                            help="relative p95 latency increase allowed before failing the comparison")
+
+    def handle(self, *args, **options):
+        # the timed requests repeat the warm-up one: with the response cache, the lists would be measured
+        # as cache hits, without their queries nor their serialization.
+        # the deletions are timed with their purge, which the background threads could not run on the
+        # in-memory test database.
+        settings_overrides = {"PURGE": {"BACKGROUND": False}}
+        if not options["response_cache"]:
+            settings_overrides["RESPONSE_CACHE"] = {"ENABLED": False}
+
+        with benchmark_database(), override_settings(**settings_overrides):
+            context = self.seed(options)
+            endpoints = self.get_endpoints()
+            if options["only"]:
+                names = set(options["only"].split(","))
+                endpoints = [endpoint for endpoint in endpoints if endpoint.name in names]
+            results = {endpoint.name: self.run(endpoint, context, options["iterations"]) for endpoint in endpoints}
+
+        report = {
+            "meta": {
+                "scale": {name: options[name] for name in ("users", "projects", "contributors", "issues", "comments")},
+                "iterations": options["iterations"],
+                "response_cache": options["response_cache"],
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+            },
+            "endpoints": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+            self.print_table(results)
+        else:
+            self.stdout.write(output)
+
+        if options["compare"]:
+            self.compare(results, options)
+
+    def seed(self, options):
+        author = seed(
+            users=options["users"], projects=options["projects"], contributors=options["contributors"],
+            issues=options["issues"], comments=options["comments"],
+        )
+        login_user = User.objects.create(
+            username="bench-login", email="bench-login@example.com", age=30, password=make_password(LOGIN_PASSWORD)
+        )
+        project = Project.objects.filter(author=author).order_by("pk").first()
+        issue = Issue.objects.filter(project=project).order_by("pk").first()
+        comment = Comment.objects.filter(issue=issue).order_by("pk").first()
+        contributor = project.contributors.exclude(pk=author.pk).order_by("pk").first() or author
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token(author)}")
+        return {
+            "client": client,
+            "anonymous": APIClient(),
+            "author": author,
+            "login_user": login_user,
+            "project": project.pk,
+            "issue": issue.pk,
+            "comment": comment.pk if comment else None,
+            "contributor": contributor.pk,
+            "refresh": str(RefreshToken.for_user(author)),
+            "sequence": count(),
+        }
+
+    @staticmethod
+    def _new_user(ctx):
+        number = next(ctx["sequence"])
+        return User.objects.create(username=f"bench-new-{number}", email=f"new-{number}@example.com", age=30)
+
+    @staticmethod
+    def _new_project(ctx):
+        project = Project.objects.create(
+            name=f"Deleted {next(ctx['sequence'])}", description="d", type=Project.BACKEND, author=ctx["author"]
+        )
+        project.contributors.add(ctx["author"])
+        Issue.objects.create(
+            name="Deleted issue", description="d", tag=Issue.BUG, priority=Issue.LOW, project=project,
+            author=ctx["author"], assignee=ctx["author"],
+        )
+        return project.pk
+
+    @staticmethod
+    def _new_issue(ctx):
+        return Issue.objects.create(
+            name=f"Deleted {next(ctx['sequence'])}", description="d", tag=Issue.BUG, priority=Issue.LOW,
+            project_id=ctx["project"], author=ctx["author"], assignee=ctx["author"],
+        ).pk
+
+    @staticmethod
+    def _new_comment(ctx):
+        return Comment.objects.create(
+            name=f"Deleted {next(ctx['sequence'])}", description="d", issue_id=ctx["issue"], author=ctx["author"]
+        ).pk
+
+    def _new_contributor(self, ctx):
+        user = self._new_user(ctx)
+        Project.objects.get(pk=ctx["project"]).contributors.add(user)
+        return user.pk
+
+    def get_endpoints(self):
+        def project(ctx, i):
+            return f"/api/projects/{ctx['project']}/"
+
+        def issues(ctx, i):
+            return f"{project(ctx, i)}issues/"
+
+        def issue(ctx, i):
+            return f"{issues(ctx, i)}{ctx['issue']}/"
+
+        def comments(ctx, i):
+            return f"{issue(ctx, i)}comments/"
+
+        def comment(ctx, i):
+            return f"{comments(ctx, i)}{ctx['comment']}/"
+
+        def unique(prefix):
+            return lambda ctx, i: f"{prefix} {next(ctx['sequence'])}"
+
+        def issue_data(ctx, i):
+            return {"name": unique("Issue")(ctx, i), "description": "d", "tag": Issue.BUG,
+                    "priority": Issue.HIGH, "assignee": ctx["author"].pk}
+
+        return [
+            Endpoint("signup", "post", lambda ctx, i: "/api/signup/", status=201, data=lambda ctx, i: {
+                "username": unique("signup")(ctx, i).replace(" ", "-"), "password": LOGIN_PASSWORD,
+                "email": "signup@example.com", "age": 30, "contact_consent": False, "data_share_consent": False,
+            }),
+            Endpoint("login", "post", lambda ctx, i: "/api/login/",
+                     data=lambda ctx, i: {"username": "bench-login", "password": LOGIN_PASSWORD}),
+            Endpoint("token-refresh", "post", lambda ctx, i: "/api/token/refresh/",
+                     data=lambda ctx, i: {"refresh": ctx["refresh"]}),
+            Endpoint("users-list", "get", lambda ctx, i: "/api/users/"),
+            Endpoint("users-retrieve", "get", lambda ctx, i: f"/api/users/{ctx['author'].pk}/"),
+            Endpoint("users-update", "patch", lambda ctx, i: f"/api/users/{ctx['author'].pk}/",
+                     data=lambda ctx, i: {"age": 30 + i % 10}),
+
+            Endpoint("projects-list", "get", lambda ctx, i: "/api/projects/"),
+            Endpoint("projects-list-cursor", "get", lambda ctx, i: "/api/projects/?pagination=cursor"),
+            Endpoint("projects-list-count", "get", lambda ctx, i: "/api/projects/?contributors=count"),
+            Endpoint("projects-retrieve", "get", project),
+            Endpoint("projects-create", "post", lambda ctx, i: "/api/projects/", status=201,
+                     data=lambda ctx, i: {"name": unique("Project")(ctx, i), "description": "d", "type": "B"}),
+            Endpoint("projects-update", "patch", project, data=lambda ctx, i: {"description": f"Updated {i}"}),
+            Endpoint("projects-delete", "delete", lambda ctx, i: f"/api/projects/{ctx['prepared']}/",
+                     prepare=self._new_project, status=204),
+            Endpoint("projects-export-ndjson", "get", lambda ctx, i: f"{project(ctx, i)}export/?format=ndjson"),
+            Endpoint("projects-export-csv", "get", lambda ctx, i: f"{project(ctx, i)}export/?format=csv"),
+            Endpoint("projects-search", "get", lambda ctx, i: f"{project(ctx, i)}search/?q=benchmark+issue"),
+            Endpoint("projects-stats", "get", lambda ctx, i: f"{project(ctx, i)}stats/"),
+
+            Endpoint("contributors-list", "get", lambda ctx, i: f"{project(ctx, i)}contributors/"),
+            Endpoint("contributors-retrieve", "get",
+                     lambda ctx, i: f"{project(ctx, i)}contributors/{ctx['contributor']}/"),
+            Endpoint("contributors-create", "post", lambda ctx, i: f"{project(ctx, i)}contributors/", status=201,
+                     data=lambda ctx, i: {"user": self._new_user(ctx).pk}),
+            Endpoint("contributors-delete", "delete",
+                     lambda ctx, i: f"{project(ctx, i)}contributors/{ctx['prepared']}/",
+                     prepare=self._new_contributor, status=204),
+            Endpoint("contributors-bulk", "post", lambda ctx, i: f"{project(ctx, i)}contributors/bulk/",
+                     data=lambda ctx, i: {"add": [self._new_user(ctx).pk], "remove": [ctx["prepared"]]},
+                     prepare=self._new_contributor),
+
+            Endpoint("issues-list", "get", issues),
+            Endpoint("issues-list-filtered", "get",
+                     lambda ctx, i: f"{issues(ctx, i)}?state=T&priority=L&ordering=-created_time"),
+            Endpoint("issues-list-sparse", "get", lambda ctx, i: f"{issues(ctx, i)}?fields=id,name,state&compact=1"),
+            Endpoint("issues-retrieve", "get", issue),
+            Endpoint("issues-create", "post", issues, data=issue_data, status=201),
+            Endpoint("issues-update", "patch", issue, data=lambda ctx, i: {"description": f"Updated {i}"}),
+            Endpoint("issues-delete", "delete", lambda ctx, i: f"{issues(ctx, i)}{ctx['prepared']}/",
+                     prepare=self._new_issue, status=204),
+            Endpoint("issues-bulk-create", "post", lambda ctx, i: f"{issues(ctx, i)}bulk/", status=201,
+                     data=lambda ctx, i: [issue_data(ctx, i) for index in range(10)]),
+            Endpoint("issues-bulk-update", "patch", lambda ctx, i: f"{issues(ctx, i)}bulk/",
+                     data=lambda ctx, i: [{"id": ctx["issue"], "description": f"Bulk {i}"}]),
+
+            Endpoint("comments-list", "get", comments),
+            Endpoint("comments-retrieve", "get", comment),
+            Endpoint("comments-create", "post", comments, status=201,
+                     data=lambda ctx, i: {"name": unique("Comment")(ctx, i), "description": "d"}),
+            Endpoint("comments-update", "patch", comment, data=lambda ctx, i: {"description": f"Updated {i}"}),
+            Endpoint("comments-delete", "delete", lambda ctx, i: f"{comments(ctx, i)}{ctx['prepared']}/",
+                     prepare=self._new_comment, status=204),
+            Endpoint("comments-bulk-create", "post", lambda ctx, i: f"{comments(ctx, i)}bulk/", status=201,
+                     data=lambda ctx, i: [{"name": unique("Comment")(ctx, i), "description": "d"}
+                                          for index in range(10)]),
+            Endpoint("comments-bulk-update", "patch", lambda ctx, i: f"{comments(ctx, i)}bulk/",
+                     data=lambda ctx, i: [{"id": ctx["comment"], "description": f"Bulk {i}"}]),
+
+            Endpoint("async-projects-list", "get", lambda ctx, i: "/api/async/projects/"),
+            Endpoint("async-projects-retrieve", "get", lambda ctx, i: f"/api/async{project(ctx, i)[4:]}"),
+            Endpoint("async-issues-list", "get", lambda ctx, i: f"/api/async{issues(ctx, i)[4:]}"),
+            Endpoint("async-issues-retrieve", "get", lambda ctx, i: f"/api/async{issue(ctx, i)[4:]}"),
+            Endpoint("async-comments-list", "get", lambda ctx, i: f"/api/async{comments(ctx, i)[4:]}"),
+            Endpoint("async-comments-retrieve", "get", lambda ctx, i: f"/api/async{comment(ctx, i)[4:]}"),
+        ]
+
+    def run(self, endpoint, ctx, iterations):
+        client = ctx["anonymous"] if endpoint.name in ("signup", "login", "token-refresh") else ctx["client"]
+        queries, latencies, sizes = [], [], []
+        # the first request warms up the caches and is not recorded.
+        for i in range(iterations + 1):
+            if endpoint.prepare is not None:
+                ctx["prepared"] = endpoint.prepare(ctx)
+            path = endpoint.path(ctx, i)
+            data = endpoint.data(ctx, i) if endpoint.data is not None else None
+
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = getattr(client, endpoint.method)(path, data, format="json")
+                content = b"".join(response.streaming_content) if response.streaming else response.content
+                elapsed = time.perf_counter() - start
+
+            if response.status_code != endpoint.status:
+                raise CommandError(
+                    f"{endpoint.name}: {endpoint.method.upper()} {path} returned {response.status_code} "
+                    f"instead of {endpoint.status}: {content[:300]!r}"
+                )
+            if i:
+                queries.append(len(captured))
+                latencies.append(elapsed * 1000)
+                sizes.append(len(content))
+
+        return {
+            "method": endpoint.method.upper(),
+            "path": endpoint.path(ctx, 0),
+            "queries": statistics.median_low(queries),
+            "queries_max": max(queries),
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "bytes": statistics.median_low(sizes),
+        }
+
+    def print_table(self, results):
+        self.stdout.write(f"{'endpoint':<28} {'queries':>7} {'max':>4} {'p50 ms':>9} {'p95 ms':>9} {'bytes':>8}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<28} {result['queries']:>7} {result['queries_max']:>4} {result['p50_ms']:>9.2f} "
+                f"{result['p95_ms']:>9.2f} {result['bytes']:>8}"
+            )
+
+    def compare(self, results, options):
+        with open(options["compare"]) as file:
+            baseline = json.load(file)
+        # the runs of the previous versions kept the response cache by default.
+        baseline_cache = baseline["meta"].get("response_cache", True)
+        if baseline_cache != options["response_cache"]:
+            raise CommandError(
+                f"{options['compare']} was recorded with response_cache={baseline_cache}, this run has "
+                f"response_cache={options['response_cache']}: use the same --response-cache option."
+            )
+        baseline = baseline["endpoints"]
+
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result["queries"] > before["queries"] + options["query_threshold"]:
+                regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+            if result["p95_ms"] > before["p95_ms"] * (1 + options["latency_threshold"]):
+                regressions.append(f"{name}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+
+        if regressions:
+            raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+        self.stderr.write(f"No regression compared to {options['compare']}.")
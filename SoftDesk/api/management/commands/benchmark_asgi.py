@@ -0,0 +1,89 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from api.benchmarking import access_token, benchmark_database, seed
+from api.models import Project
+
+
+class Command(BaseCommand):
+    """
+    Compares the throughput of the read endpoints served by the DRF viewsets (WSGI, one thread per request)
+    with their native async versions (ASGI, one event loop), under the same concurrency.
+    The data is seeded in a test database, destroyed at the end. The response cache, which only the viewsets
+    use, is disabled so that both sides build their responses.
+    """
+    help = "Reports the requests/sec of the WSGI and ASGI read endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="requests sent per endpoint and server")
+        parser.add_argument("--concurrency", type=int, default=20, help="requests in flight at once")
+        parser.add_argument("--issues", type=int, default=50, help="issues seeded per project")
+
+    def handle(self, *args, **options):
+        with benchmark_database(), override_settings(RESPONSE_CACHE={"ENABLED": False}):
+            author = seed(issues=options["issues"])
+            project = Project.objects.filter(author=author).first()
+            issue = project.related_project.first()
+            comment = issue.comments.first()
+            paths = [
+                "projects/",
+                f"projects/{project.pk}/",
+                f"projects/{project.pk}/issues/",
+                f"projects/{project.pk}/issues/{issue.pk}/",
+                f"projects/{project.pk}/issues/{issue.pk}/comments/",
+                f"projects/{project.pk}/issues/{issue.pk}/comments/{comment.pk}/",
+            ]
+            headers = {"Authorization": f"Bearer {access_token(author)}"}
+
+            for path in paths:
+                wsgi = self.run_wsgi(f"/api/{path}", headers, options)
+                asgi = asyncio.run(self.run_asgi(f"/api/async/{path}", headers, options))
+                self.stdout.write(f"{path:<40} WSGI {self.format(wsgi)}   ASGI {self.format(asgi)}")
+
+    @staticmethod
+    def format(result):
+        throughput, latencies = result
+        p50 = statistics.median(latencies) * 1000
+        p95 = statistics.quantiles(latencies, n=20)[-1] * 1000
+        return f"{throughput:8.1f} req/s  p50 {p50:6.1f} ms  p95 {p95:6.1f} ms"
+
+    @staticmethod
+    def run_wsgi(path, headers, options):
+        # a test client keeps the state of its last request (cookies, response): one per worker thread.
+        clients = threading.local()
+
+        def send(index):
+            client = getattr(clients, "client", None)
+            if client is None:
+                client = clients.client = Client()
+            start = time.perf_counter()
+            response = client.get(path, headers=headers)
+            assert response.status_code == 200, response.content
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            latencies = list(pool.map(send, range(options["requests"])))
+        return options["requests"] / (time.perf_counter() - start), latencies
+
+    @staticmethod
+    async def run_asgi(path, headers, options):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def send():
+            async with semaphore:
+                start = time.perf_counter()
+                # the headers are given per request: the AsyncClient defaults do not reach the ASGI scope.
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 200, response.content
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(send() for index in range(options["requests"])))
+        return options["requests"] / (time.perf_counter() - start), latencies
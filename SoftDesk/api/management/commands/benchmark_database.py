@@ -0,0 +1,149 @@
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.test.utils import override_settings
+from api.benchmarking import benchmark_database, seed
+from api.models import Issue, Comment
+
+# SQLite's own defaults: rollback journal, writers blocking the readers.
+SQLITE_DEFAULT_PRAGMAS = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "mmap_size": 0,
+    "cache_size": -2000,
+    "busy_timeout": 5000,
+    "temp_store": "DEFAULT",
+}
+
+
+class Command(BaseCommand):
+    """
+    Measures the concurrent read and write throughput of the configured database (DATABASE_PROFILE),
+    with reader and writer threads running requests against a test database for a fixed time.
+    Each request ends as an HTTP request does, closing its connection unless CONN_MAX_AGE keeps it.
+    The profile of settings.py is compared with a baseline: SQLite's default pragmas and one connection
+    per request for SQLite (and with the WAL journal, when the profile does not set it), one connection
+    per request for PostgreSQL.
+    """
+    help = "Reports the concurrent reads/sec and writes/sec of the database profile and of a baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8, help="threads listing issues")
+        parser.add_argument("--writers", type=int, default=2, help="threads writing comments")
+        parser.add_argument("--duration", type=float, default=5.0, help="seconds of each measure")
+        parser.add_argument("--issues", type=int, default=200, help="issues seeded per project")
+
+    def get_configurations(self):
+        conn_max_age = connection.settings_dict["CONN_MAX_AGE"]
+        if connection.vendor == "sqlite":
+            profile = getattr(settings, "SQLITE_PRAGMAS", {})
+            configurations = [
+                ("sqlite defaults", SQLITE_DEFAULT_PRAGMAS, 0),
+                ("profile", profile, conn_max_age),
+            ]
+            if str(profile.get("journal_mode")).upper() != "WAL":
+                # the profile keeps the journal of the file: also measured with SQLITE_JOURNAL_MODE=WAL.
+                configurations.append(
+                    ("profile + WAL", {**profile, "journal_mode": "WAL", "synchronous": "NORMAL"}, conn_max_age)
+                )
+            return configurations
+        return [
+            ("connection per request", None, 0),
+            ("profile", None, conn_max_age),
+        ]
+
+    def handle(self, *args, **options):
+        with benchmark_database(on_disk=True):
+            author = seed(projects=5, issues=options["issues"], comments=2)
+            self.project_ids = list(author.project_contributors.values_list("pk", flat=True))
+            self.issue_ids = list(Issue.objects.values_list("pk", flat=True))
+            self.author_id = author.pk
+
+            self.stdout.write(
+                f"{connection.vendor}, {options['readers']} readers, {options['writers']} writers, "
+                f"{options['duration']:.0f}s per measure"
+            )
+            self.stdout.write(
+                f"{'configuration':<24} {'reads/s':>9} {'writes/s':>9} {'read p95 ms':>12} "
+                f"{'write p95 ms':>13} {'errors':>7}"
+            )
+            for name, pragmas, conn_max_age in self.get_configurations():
+                results = self.measure(pragmas, conn_max_age, options)
+                self.stdout.write(
+                    f"{name:<24} {results['reads'] / options['duration']:>9.0f} "
+                    f"{results['writes'] / options['duration']:>9.0f} {results['read_p95']:>12.2f} "
+                    f"{results['write_p95']:>13.2f} {results['errors']:>7}"
+                )
+
+    def read(self):
+        issues = Issue.objects.filter(project_id=random.choice(self.project_ids)).order_by("-created_time")
+        issues.count()
+        list(issues[:10])
+
+    def write(self):
+        with transaction.atomic():
+            Comment.objects.create(
+                name=f"Benchmark comment {random.random()}", description="Benchmark comment",
+                issue_id=random.choice(self.issue_ids), author_id=self.author_id,
+            )
+
+    def measure(self, pragmas, conn_max_age, options):
+        old_conn_max_age = connection.settings_dict["CONN_MAX_AGE"]
+        # the pragmas and CONN_MAX_AGE apply to the connections opened from now on.
+        connection.close()
+        connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+        overrides = {"SQLITE_PRAGMAS": pragmas} if pragmas is not None else {}
+        latencies = {"read": [], "write": []}
+        errors = []
+        deadline = time.perf_counter() + options["duration"]
+
+        def worker(operation, kind):
+            durations, failures = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    close_old_connections()
+                    start = time.perf_counter()
+                    try:
+                        operation()
+                    except OperationalError:
+                        # e.g. "database is locked" after busy_timeout.
+                        failures += 1
+                    else:
+                        durations.append(time.perf_counter() - start)
+                    # end of the request: the connection is closed unless CONN_MAX_AGE keeps it open.
+                    close_old_connections()
+            finally:
+                connection.close()
+                latencies[kind].extend(durations)
+                errors.append(failures)
+
+        try:
+            with override_settings(**overrides):
+                threads = [
+                    threading.Thread(target=worker, args=(self.read, "read")) for index in range(options["readers"])
+                ] + [
+                    threading.Thread(target=worker, args=(self.write, "write")) for index in range(options["writers"])
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            connection.settings_dict["CONN_MAX_AGE"] = old_conn_max_age
+            connection.close()
+
+        def p95(durations):
+            return statistics.quantiles(durations, n=20)[-1] * 1000 if len(durations) > 1 else 0.0
+
+        return {
+            "reads": len(latencies["read"]),
+            "writes": len(latencies["write"]),
+            "read_p95": p95(latencies["read"]),
+            "write_p95": p95(latencies["write"]),
+            "errors": sum(errors),
+        }
@@ -0,0 +1,43 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Measures the signups per second each configured password hasher allows,
+    hashing with one thread and with one thread per CPU, the default CONCURRENCY of PASSWORD_HASHING_ADMISSION.
+    """
+    help = "Reports the signups/sec per core of the configured password hashers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--passwords", type=int, default=20, help="passwords hashed per measure")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="threads of the pool measure")
+
+    def handle(self, *args, **options):
+        count, workers = options["passwords"], options["workers"]
+        for hasher in get_hashers():
+            try:
+                hasher.encode("warm-up", hasher.salt())
+            except ValueError as exc:
+                # the hasher's library is not installed.
+                self.stdout.write(f"{hasher.algorithm:<16} skipped: {exc}")
+                continue
+
+            start = time.perf_counter()
+            for index in range(count):
+                hasher.encode(f"password-{index}", hasher.salt())
+            single = count / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(lambda index: hasher.encode(f"password-{index}", hasher.salt()), range(count)))
+            pooled = count / (time.perf_counter() - start)
+
+            self.stdout.write(
+                f"{hasher.algorithm:<16} {single:8.1f} signups/sec on 1 core   "
+                f"{pooled:8.1f} signups/sec with {workers} threads ({pooled / workers:.1f} per core)"
+            )
@@ -0,0 +1,108 @@
+import statistics
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from api.profiling import get_reports_directory, list_reports, read_report
+
+
+class Command(BaseCommand):
+    """
+    Lists the reports of the slow requests written by SlowRequestProfilerMiddleware, summarizes them by route
+    (durations, the functions and SQL statements taking the most time), or shows one of them.
+    """
+    help = "Lists, summarizes or shows the reports of the profiled slow requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--route", help="only the reports of this route, e.g. api:project-issue-list")
+        parser.add_argument("--limit", type=int, default=20, help="reports listed, functions and statements shown")
+        parser.add_argument("--summary", action="store_true", help="summarize the reports by route")
+        parser.add_argument("--show", metavar="NAME", help="show a report, by the name of its file")
+        parser.add_argument("--clear", action="store_true", help="delete every report")
+
+    def handle(self, *args, **options):
+        paths = list_reports()
+        if options["clear"]:
+            for path in paths:
+                path.unlink(missing_ok=True)
+            self.stdout.write(f"Deleted {len(paths)} reports from {get_reports_directory()}.")
+            return
+        if options["show"]:
+            self.show(options["show"], options["limit"])
+            return
+
+        reports = []
+        for path in paths:
+            try:
+                report = read_report(path)
+            except (OSError, ValueError):
+                # deleted by the ring meanwhile.
+                continue
+            if options["route"] in (None, report["route"]):
+                reports.append((path, report))
+        if not reports:
+            self.stdout.write(f"No report in {get_reports_directory()}.")
+        elif options["summary"]:
+            self.summarize(reports, options["limit"])
+        else:
+            self.list(reports[:options["limit"]])
+
+    def list(self, reports):
+        self.stdout.write(f"{'report':<44} {'time':<19} {'route':<32} {'status':>6} {'ms':>9} {'queries':>7}")
+        for path, report in reports:
+            self.stdout.write(
+                f"{path.stem:<44} {datetime.fromtimestamp(report['time']):%Y-%m-%d %H:%M:%S} "
+                f"{report['route']:<32} {report['status']:>6} {report['duration_ms']:>9.1f} {report['queries']:>7}"
+            )
+
+    def summarize(self, reports, limit):
+        by_route = {}
+        for path, report in reports:
+            by_route.setdefault(report["route"], []).append(report)
+
+        for route, route_reports in sorted(by_route.items(), key=lambda item: -len(item[1])):
+            durations = [report["duration_ms"] for report in route_reports]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{route}: {len(route_reports)} reports, median {statistics.median(durations):.1f} ms, "
+                f"max {max(durations):.1f} ms, {statistics.mean(r['queries'] for r in route_reports):.1f} queries"
+            ))
+
+            # own time of the functions and total time of the statements, summed over the reports.
+            functions, statements = {}, {}
+            for report in route_reports:
+                for row in (report["profile"] or {}).get("own", []):
+                    functions[row["function"]] = functions.get(row["function"], 0) + row["own_ms"]
+                for row in report["sql"]:
+                    statements[row["sql"]] = statements.get(row["sql"], 0) + row["total_ms"]
+
+            if functions:
+                self.stdout.write("  functions (own ms):")
+                for function, total in sorted(functions.items(), key=lambda item: -item[1])[:limit]:
+                    self.stdout.write(f"  {total:>10.1f}  {function}")
+            self.stdout.write("  SQL statements (ms):")
+            for sql, total in sorted(statements.items(), key=lambda item: -item[1])[:limit]:
+                self.stdout.write(f"  {total:>10.1f}  {sql[:200]}")
+
+    def show(self, name, limit):
+        path = get_reports_directory() / (name if name.endswith(".json") else f"{name}.json")
+        try:
+            report = read_report(path)
+        except OSError:
+            raise CommandError(f"No report {path}.")
+
+        self.stdout.write(
+            f"{report['method']} {report['path']} ({report['route']}) -> {report['status']} "
+            f"in {report['duration_ms']:.1f} ms, {report['queries']} queries"
+        )
+        self.stdout.write("phases (ms): " + ", ".join(f"{k} {v:.1f}" for k, v in report["phases_ms"].items()))
+        if report["profile"] is not None:
+            self.stdout.write(self.style.MIGRATE_HEADING("Functions by cumulative time:"))
+            for row in report["profile"]["cumulative"][:limit]:
+                self.stdout.write(f"  {row['cumulative_ms']:>10.1f} {row['calls']:>7}  {row['function']}")
+            self.stdout.write(self.style.MIGRATE_HEADING("Stacks of the functions with the most own time:"))
+            for row in report["profile"]["stacks"][:limit]:
+                self.stdout.write(f"  {row['own_ms']:.1f} ms")
+                for frame in row["frames"]:
+                    self.stdout.write(f"      {frame}")
+        self.stdout.write(self.style.MIGRATE_HEADING("SQL statements:"))
+        for row in report["sql"][:limit]:
+            self.stdout.write(f"  {row['total_ms']:>10.1f} {row['count']:>5}x  {row['sql']}")
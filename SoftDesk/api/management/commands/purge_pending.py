@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from api.purge import purge_pending
+
+
+class Command(BaseCommand):
+    """
+    Finishes the purges of the deleted projects and issues whose background thread did not end,
+    e.g. because their worker was restarted. To run at the start of the server, or periodically.
+    """
+    help = "Purges the projects and issues still marked as deleted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int, default=600,
+            help="seconds since the deletion: the more recent purges may still be running",
+        )
+
+    def handle(self, *args, **options):
+        projects, issues = purge_pending(options["older_than"])
+        self.stdout.write(f"{projects} projects and {issues} issues purged.")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from api.stats import rebuild_counters
+
+
+class Command(BaseCommand):
+    """
+    Computes the issue counters again from the issues, e.g. after enabling settings.ISSUE_STATS["COUNTERS"].
+    """
+    help = "Rebuilds the counters of issues per project, assignee, state, priority and tag."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, help="id of the only project to rebuild")
+
+    def handle(self, *args, **options):
+        count = rebuild_counters(options["project"])
+        self.stdout.write(f"{count} counters rebuilt.")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Fills the search index again from the issues and comments,
+    in case rows have been written without the model signals (raw SQL, imports).
+    """
+    help = "Rebuilds the full-text search index of the issues and comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="objects indexed at once")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_index(options["chunk_size"])
+        self.stdout.write(f"{count} issues and comments indexed.")
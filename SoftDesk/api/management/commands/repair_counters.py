@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.counters import repair_counters
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the denormalized issue_count of the projects and comment_count / last_activity of the issues,
+    e.g. after rows have been written or deleted with raw SQL.
+    """
+    help = "Repairs the issue and comment counters of the projects and issues."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            issues, projects = repair_counters()
+        self.stdout.write(f"{issues} issues and {projects} projects repaired.")
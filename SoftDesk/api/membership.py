@@ -0,0 +1,306 @@
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Exists, OuterRef
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from api.lru import TimedLRUCache
+from api.models import Project
+
+# Roles of a user in a project.
+AUTHOR = "author"
+CONTRIBUTOR = "contributor"
+NONE = "none"
+
+# Default settings of the cross-request membership cache, overridden by settings.MEMBERSHIP_CACHE.
+# A removed contributor must lose the access at once, in every process: the cache is only used when
+# its invalidations reach every process serving the API.
+MEMBERSHIP_CACHE_DEFAULTS = {
+    "ENABLED": True,
+    # name of a cache in settings.CACHES shared by every process (e.g. Redis), with versioned keys.
+    # None disables the cache, unless LOCAL is set.
+    "CACHE_ALIAS": None,
+    # keeps the entries in the memory of the process instead: only correct when a single process serves
+    # the API (e.g. runserver), as the invalidations do not reach the other ones.
+    "LOCAL": False,
+    # maximum number of (user, project) entries kept in the process, with LOCAL.
+    "MAX_ENTRIES": 10000,
+    # seconds after which an entry is fetched again from the database.
+    "TIMEOUT": 60,
+}
+
+
+class ProjectMembership:
+    """
+    Role of the logged-in user in a given project.
+    Resolved once per request and shared by the permissions and the nested viewsets.
+    """
+
+    def __init__(self, project_pk, is_author, is_contributor, project=None):
+        self.project_pk = project_pk
+        self.is_author = is_author
+        self.is_contributor = is_contributor
+        self._project = project
+
+    @property
+    def role(self):
+        if self.is_author:
+            return AUTHOR
+        if self.is_contributor:
+            return CONTRIBUTOR
+        return NONE
+
+    @property
+    def project(self):
+        # When the role comes from the membership cache, the project is only fetched if a view needs it.
+        if self._project is None:
+            self._project = get_object_or_404(Project, pk=self.project_pk)
+        return self._project
+
+
+class LocalMembershipCache(TimedLRUCache):
+    """
+    Process-wide LRU cache of the users' roles, with entries expiring after a timeout.
+    As in SharedMembershipCache, the keys contain a version number per project, taken before the role is read
+    from the database: a role read before an invalidation is stored under the old version, never read again.
+    """
+
+    def __init__(self, max_entries, timeout):
+        super().__init__(max_entries, timeout)
+        self._versions = {}
+
+    def entry_key(self, user_id, project_id):
+        return user_id, project_id, self._versions.get(project_id, 0)
+
+    def invalidate_project(self, project_id):
+        with self._lock:
+            self._versions[project_id] = self._versions.get(project_id, 0) + 1
+        self.delete_matching(lambda key: key[1] == project_id)
+
+    def clear(self):
+        with self._lock:
+            for project_id in self._versions:
+                self._versions[project_id] += 1
+        super().clear()
+
+
+class SharedMembershipCache:
+    """
+    Membership cache stored in a Django cache, shared between processes.
+    The keys contain a version number per project and a global one: invalidating bumps a version,
+    so that the old entries are never read again and expire by themselves.
+    The key of an entry is computed before the role is read from the database, so that a role read
+    before an invalidation can only be stored under the old version.
+    """
+
+    GENERATION_KEY = "membership:generation"
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _version_key(project_id):
+        return f"membership:project:{project_id}:version"
+
+    def entry_key(self, user_id, project_id):
+        version_key = self._version_key(project_id)
+        versions = self.cache.get_many([self.GENERATION_KEY, version_key])
+        generation = versions.get(self.GENERATION_KEY) or self.cache.get_or_set(self.GENERATION_KEY, 1, None)
+        version = versions.get(version_key) or self.cache.get_or_set(version_key, 1, None)
+        return f"membership:{generation}:project:{project_id}:{version}:user:{user_id}"
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def _bump(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # no version yet, so nothing has been cached with this key.
+            pass
+
+    def invalidate_project(self, project_id):
+        self._bump(self._version_key(project_id))
+
+    def clear(self):
+        self._bump(self.GENERATION_KEY)
+
+
+_membership_cache = None
+_membership_cache_lock = threading.Lock()
+
+
+def get_membership_cache():
+    """
+    Return the cross-request membership cache configured in settings, or None if it is disabled
+    or no cache shared by the processes is configured.
+    """
+    global _membership_cache
+
+    options = {**MEMBERSHIP_CACHE_DEFAULTS, **getattr(settings, "MEMBERSHIP_CACHE", {})}
+    if not options["ENABLED"] or not (options["CACHE_ALIAS"] or options["LOCAL"]):
+        return None
+
+    if _membership_cache is None:
+        with _membership_cache_lock:
+            if _membership_cache is None:
+                if options["CACHE_ALIAS"]:
+                    _membership_cache = SharedMembershipCache(options["CACHE_ALIAS"], options["TIMEOUT"])
+                else:
+                    _membership_cache = LocalMembershipCache(options["MAX_ENTRIES"], options["TIMEOUT"])
+    return _membership_cache
+
+
+def reset_membership_cache(setting="MEMBERSHIP_CACHE", **kwargs):
+    """
+    Drop the membership cache, so that it is built again from the settings.
+    Called when settings.MEMBERSHIP_CACHE changes.
+    """
+    global _membership_cache
+
+    if setting == "MEMBERSHIP_CACHE":
+        _membership_cache = None
+
+
+def invalidate_project_memberships(project_id):
+    """
+    Forget the cached roles of every user in the project project_id.
+    """
+    cache = get_membership_cache()
+    if cache is not None:
+        cache.invalidate_project(project_id)
+
+
+def clear_membership_cache():
+    """
+    Forget every cached role.
+    """
+    cache = get_membership_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def _request_memberships(request):
+    memberships = getattr(request, "_project_memberships", None)
+    if memberships is None:
+        memberships = request._project_memberships = {}
+    return memberships
+
+
+def get_membership(request, project_pk):
+    """
+    Return the ProjectMembership of request.user in the project project_pk.
+    The project and the user's role are fetched with a single query, using an EXISTS subquery
+    on the contributors table instead of loading every contributor.
+    The result is stored on the request, so that permissions and views reuse it,
+    and the role is kept in the membership cache for the next requests.
+    """
+    memberships = _request_memberships(request)
+    key = str(project_pk)
+    if key not in memberships:
+        memberships[key] = _resolve_membership(request.user, project_pk)
+
+    return memberships[key]
+
+
+async def aget_membership(request, project_pk):
+    """
+    Async version of get_membership(), for the async views.
+    """
+    memberships = _request_memberships(request)
+    key = str(project_pk)
+    if key not in memberships:
+        memberships[key] = await _aresolve_membership(request.user, project_pk)
+
+    return memberships[key]
+
+
+def _user_id(user):
+    return user.pk if user and user.is_authenticated else None
+
+
+def _cache_for(user_id, project_pk):
+    if user_id is None or not str(project_pk).isdigit():
+        # anonymous users and malformed project ids are never cached.
+        return None
+    return get_membership_cache()
+
+
+def _membership_queryset(user_id):
+    return Project.objects.annotate(
+        is_contributor=Exists(
+            Project.contributors.through.objects.filter(project_id=OuterRef("pk"), user_id=user_id)
+        )
+    )
+
+
+def _membership_from_project(project, user_id):
+    is_author = user_id is not None and project.author_id == user_id
+    return ProjectMembership(project.pk, is_author, project.is_contributor, project=project)
+
+
+def _resolve_membership(user, project_pk):
+    user_id = _user_id(user)
+
+    cache = _cache_for(user_id, project_pk)
+    if cache is not None:
+        # the key is taken before the database is read (see SharedMembershipCache).
+        key = cache.entry_key(user_id, int(project_pk))
+        cached = cache.get(key)
+        if cached is not None:
+            return ProjectMembership(project_pk, *cached)
+
+    project = get_object_or_404(_membership_queryset(user_id), pk=project_pk)
+    membership = _membership_from_project(project, user_id)
+
+    if cache is not None:
+        cache.set(key, (membership.is_author, membership.is_contributor))
+    return membership
+
+
+async def _call_cache(cache, method, *args):
+    # the local cache is in memory, a shared cache does network calls: they are run in a thread.
+    if isinstance(cache, LocalMembershipCache):
+        return getattr(cache, method)(*args)
+    return await sync_to_async(getattr(cache, method))(*args)
+
+
+async def _aresolve_membership(user, project_pk):
+    user_id = _user_id(user)
+
+    cache = _cache_for(user_id, project_pk)
+    if cache is not None:
+        key = await _call_cache(cache, "entry_key", user_id, int(project_pk))
+        cached = await _call_cache(cache, "get", key)
+        if cached is not None:
+            return ProjectMembership(project_pk, *cached)
+
+    try:
+        project = await _membership_queryset(user_id).aget(pk=project_pk)
+    except Project.DoesNotExist:
+        raise Http404("No Project matches the given query.")
+    membership = _membership_from_project(project, user_id)
+
+    if cache is not None:
+        await _call_cache(cache, "set", key, (membership.is_author, membership.is_contributor))
+    return membership
+
+
+class ProjectMembershipMixin:
+    """
+    Gives the nested viewsets access to the membership resolved by the permissions.
+    """
+
+    @property
+    def membership(self):
+        return get_membership(self.request, self.kwargs["project_pk"])
@@ -0,0 +1,256 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+# Default settings of the metrics, overridden by settings.METRICS.
+METRICS_DEFAULTS = {
+    "ENABLED": True,
+    # directory shared by the worker processes (e.g. gunicorn's), each one writing its metrics in its own file:
+    # /metrics adds up the files of every worker. Must be emptied when the server starts.
+    # None: /metrics only shows the metrics of the process serving it.
+    "DIRECTORY": None,
+    # seconds between two writes of a process' file, by a background thread of the process.
+    "FLUSH_INTERVAL": 1.0,
+    # /metrics requires an "Authorization: Bearer <TOKEN>" header. None disables /metrics (404).
+    "TOKEN": None,
+}
+
+PREFIX = "softdesk"
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+# name: (type, help, buckets of the histograms)
+METRICS = {
+    "http_requests_total": (COUNTER, "API requests, by route, method and status code.", None),
+    "http_request_duration_seconds": (
+        HISTOGRAM,
+        "Duration of the API requests, by route and method.",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    ),
+    "db_queries_per_request": (
+        HISTOGRAM, "Database queries of the API requests, by route and method.", (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    "response_cache_requests_total": (
+        COUNTER, "Lists served from the response cache (result=hit) or built (result=miss), by route.", None,
+    ),
+    "jwt_auth_failures_total": (COUNTER, "Requests with an invalid or expired JWT, by reason.", None),
+}
+
+
+def get_metrics_options():
+    return {**METRICS_DEFAULTS, **getattr(settings, "METRICS", {})}
+
+
+class MetricsStore:
+    """
+    Metrics of this process: counters, and histograms as [count per bucket..., +Inf count, sum, count].
+    Values are keyed by (metric name, labels), the labels being a tuple of (name, value) pairs.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        # the file of a process is never taken over by another one, even with the same pid.
+        self.token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # whether the values changed since the last flush.
+        self.changed = False
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+            self.changed = True
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            histogram = self.values.get(key)
+            if histogram is None:
+                histogram = self.values[key] = [0] * (len(buckets) + 3)
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+            self.changed = True
+
+    def snapshot(self):
+        with self.lock:
+            return [[name, list(labels), value] for (name, labels), value in self.values.items()]
+
+    def path(self, directory):
+        return Path(directory) / f"{self.token}.json"
+
+    def flush(self, directory):
+        """
+        Writes the metrics of the process in its file of the directory, replaced at once.
+        """
+        with self.lock:
+            self.changed = False
+        os.makedirs(directory, exist_ok=True)
+        path = self.path(directory)
+        temporary_path = path.with_suffix(".tmp")
+        with open(temporary_path, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary_path, path)
+
+
+_store = MetricsStore()
+# thread writing the file of the process, started by its first metric.
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _reset_store():
+    # a forked worker starts its own metrics, in its own file, and its own flusher thread.
+    global _store, _flusher
+    _store = MetricsStore()
+    _flusher = None
+
+
+os.register_at_fork(after_in_child=_reset_store)
+
+
+@atexit.register
+def _flush_at_exit():
+    directory = get_metrics_options()["DIRECTORY"] if settings.configured else None
+    if directory and _store.values:
+        _store.flush(directory)
+
+
+def _flush_periodically():
+    # also runs while the worker is idle, so that /metrics served by another worker is up to date.
+    while True:
+        options = get_metrics_options()
+        time.sleep(options["FLUSH_INTERVAL"])
+        store = _store
+        if options["DIRECTORY"] and store.changed:
+            try:
+                store.flush(options["DIRECTORY"])
+            except OSError:
+                continue
+
+
+def _start_flusher(options):
+    global _flusher
+    if not options["DIRECTORY"] or _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_periodically, name="metrics-flusher", daemon=True)
+            _flusher.start()
+
+
+def record_request(route, method, status, duration, queries, cache_result=None):
+    """
+    Records an API request, measured by the ServerTimingMiddleware: its route is the name of its URL,
+    e.g. "api:project-issue-list".
+    """
+    options = get_metrics_options()
+    if not options["ENABLED"]:
+        return
+    labels = {"route": route, "method": method}
+    _store.inc("http_requests_total", {**labels, "status": str(status)})
+    _store.observe("http_request_duration_seconds", labels, duration)
+    _store.observe("db_queries_per_request", labels, queries)
+    if cache_result is not None:
+        _store.inc("response_cache_requests_total", {"route": route, "result": cache_result})
+    _start_flusher(options)
+
+
+def record_auth_failure(reason):
+    options = get_metrics_options()
+    if options["ENABLED"]:
+        _store.inc("jwt_auth_failures_total", {"reason": reason})
+        _start_flusher(options)
+
+
+def collect(options=None):
+    """
+    Returns the metrics of every process writing in the directory (or of this process only), added up.
+    """
+    options = options or get_metrics_options()
+    snapshots = [_store.snapshot()]
+    directory = options["DIRECTORY"]
+    if directory and os.path.isdir(directory):
+        own_path = _store.path(directory)
+        for path in Path(directory).glob("*.json"):
+            if path == own_path:
+                continue
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+
+    totals = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot:
+            if name not in METRICS:
+                continue
+            key = (name, tuple(tuple(label) for label in labels))
+            if isinstance(value, list):
+                total = totals.setdefault(key, [0] * len(value))
+                totals[key] = [a + b for a, b in zip(total, value)]
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(totals):
+    """
+    Formats the metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in totals.items() if metric == name)
+        full_name = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {description}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in series:
+            if kind == COUNTER:
+                lines.append(f"{full_name}{_labels(labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*buckets, "+Inf"], value[:-2]):
+                cumulative += count
+                lines.append(f"{full_name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{full_name}_sum{_labels(labels)} {_number(value[-2])}")
+            lines.append(f"{full_name}_count{_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """
+    Serves the metrics of the API to Prometheus, authenticated with the TOKEN of the settings.
+    """
+    options = get_metrics_options()
+    if not options["ENABLED"] or not options["TOKEN"]:
+        return HttpResponse(status=404)
+    authorization = request.headers.get("Authorization", "")
+    if not constant_time_compare(authorization, f"Bearer {options['TOKEN']}"):
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(collect(options)), content_type="text/plain; version=0.0.4; charset=utf-8")
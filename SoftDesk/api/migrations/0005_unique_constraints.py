@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:54
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+# fields of the unique constraints added below, by model.
+UNIQUE_FIELDS = {
+    "Project": ("author", "name", "type"),
+    "Issue": ("project", "name", "tag", "state", "priority"),
+    "Comment": ("issue", "name"),
+}
+
+
+def rename_duplicates(apps, schema_editor):
+    """
+    The rows breaking the new constraints, created before them, are renamed "<name> (<id>)":
+    the oldest row of each group keeps its name, nothing is deleted.
+    """
+    for model_name, fields in UNIQUE_FIELDS.items():
+        model = apps.get_model("api", model_name)
+        groups = (
+            model.objects.order_by().values(*fields).annotate(first=Min("pk"), rows=Count("pk")).filter(rows__gt=1)
+        )
+        for group in groups:
+            first = group.pop("first")
+            group.pop("rows")
+            for duplicate in model.objects.filter(**group).exclude(pk=first).only("pk", "name"):
+                suffix = f" ({duplicate.pk})"
+                duplicate.name = duplicate.name[:100 - len(suffix)] + suffix
+                duplicate.save(update_fields=["name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_issue_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='issue',
+            name='issue_project_name_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='comment',
+            constraint=models.UniqueConstraint(fields=('issue', 'name'), name='comment_unique_issue_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='issue',
+            constraint=models.UniqueConstraint(fields=('project', 'name', 'tag', 'state', 'priority'), name='issue_unique_project_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='project',
+            constraint=models.UniqueConstraint(fields=('author', 'name', 'type'), name='project_unique_author_name_type'),
+        ),
+    ]
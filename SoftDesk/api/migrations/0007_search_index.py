@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# The search index is not a model: it is created with the SQL of each database, then filled
+# with the existing issues and comments (see api/search.py).
+SQLITE_SQL = [
+    "CREATE VIRTUAL TABLE api_search USING fts5("
+    "keys, name, description, issue_id UNINDEXED, tokenize = 'porter unicode61 remove_diacritics 2')",
+    "INSERT INTO api_search (rowid, keys, name, description, issue_id) "
+    "SELECT id * 2, 'p' || project_id || ' i' || id, name, description, id FROM api_issue",
+    "INSERT INTO api_search (rowid, keys, name, description, issue_id) "
+    "SELECT c.id * 2 + 1, 'p' || i.project_id || ' i' || i.id, c.name, c.description, i.id "
+    "FROM api_comment c JOIN api_issue i ON i.id = c.issue_id",
+]
+
+POSTGRES_VECTOR = "setweight(to_tsvector('english', {0}name), 'A') || setweight(to_tsvector('english', {0}description), 'B')"
+POSTGRES_SQL = [
+    "CREATE TABLE api_search ("
+    "id bigint PRIMARY KEY, project_id integer NOT NULL, issue_id integer NOT NULL, "
+    "name varchar(100) NOT NULL, document tsvector NOT NULL)",
+    "CREATE INDEX api_search_document_idx ON api_search USING GIN (document)",
+    "CREATE INDEX api_search_project_idx ON api_search (project_id)",
+    "CREATE INDEX api_search_issue_idx ON api_search (issue_id)",
+    "INSERT INTO api_search (id, project_id, issue_id, name, document) "
+    f"SELECT id * 2, project_id, id, name, {POSTGRES_VECTOR.format('')} FROM api_issue",
+    "INSERT INTO api_search (id, project_id, issue_id, name, document) "
+    f"SELECT c.id * 2 + 1, i.project_id, i.id, c.name, {POSTGRES_VECTOR.format('c.')} "
+    "FROM api_comment c JOIN api_issue i ON i.id = c.issue_id",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_SQL, "postgresql": POSTGRES_SQL}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        schema_editor.execute("DROP TABLE api_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_updated_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_issue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('T', 'ToDo'), ('I', 'In Progress'), ('C', 'Completed')], max_length=2, verbose_name='issue state')),
+                ('priority', models.CharField(choices=[('L', 'Low'), ('M', 'Medium'), ('H', 'High')], max_length=1, verbose_name='issue priority')),
+                ('tag', models.CharField(choices=[('B', 'Bug'), ('F', 'Feature'), ('T', 'Task')], max_length=2, verbose_name='issue tag')),
+                ('count', models.IntegerField(default=0, verbose_name='number of issues')),
+                ('assignee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='issue_counters', to=settings.AUTH_USER_MODEL, verbose_name='issue assignee')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='issue_counters', to='api.project', verbose_name='project')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='issuecounter',
+            constraint=models.UniqueConstraint(fields=('project', 'assignee', 'state', 'priority', 'tag'), name='issuecounter_unique_key'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:12
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def fill_counters(apps, schema_editor):
+    Project = apps.get_model('api', 'Project')
+    Issue = apps.get_model('api', 'Issue')
+    Comment = apps.get_model('api', 'Comment')
+
+    comments = Comment.objects.filter(issue_id=OuterRef('pk')).order_by().values('issue_id')
+    Issue.objects.update(
+        comment_count=Coalesce(
+            Subquery(comments.annotate(count=Count('*')).values('count')), 0, output_field=IntegerField()
+        ),
+        # the updated_time of the comments written before 0006_updated_time is the time of that migration.
+        last_activity=Coalesce(Subquery(comments.annotate(latest=Max('created_time')).values('latest')),
+                               F('created_time')),
+    )
+    issues = Issue.objects.filter(project_id=OuterRef('pk')).order_by().values('project_id')
+    Project.objects.update(
+        issue_count=Coalesce(
+            Subquery(issues.annotate(count=Count('*')).values('count')), 0, output_field=IntegerField()
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_issue_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of comments'),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='last activity'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issue_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of issues'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='issue',
+            name='issue_unique_project_name',
+        ),
+        migrations.RemoveConstraint(
+            model_name='project',
+            name='project_unique_author_name_type',
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='deleted_time',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='deleted on'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='deleted_time',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='deleted on'),
+        ),
+        migrations.AddConstraint(
+            model_name='issue',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_time__isnull', True)), fields=('project', 'name', 'tag', 'state', 'priority'), name='issue_unique_project_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='project',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_time__isnull', True)), fields=('author', 'name', 'type'), name='project_unique_author_name_type'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -14,10 +15,51 @@ class User(AbstractUser):
         return self.username
 
 
-class Project(models.Model):
-    """ Project model for creating projects"""
+class CounterFieldsModel(models.Model):
+    """ Base of the models with denormalized counters, maintained by atomic UPDATE queries (see api/counters.py).
+    Saving an existing object does not write the counters, so that concurrent increments are never lost."""
 
-    objects = None
+    counter_fields = ()
+    # other fields only written by UPDATE queries, never by save().
+    update_only_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields + self.update_only_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class LiveManager(models.Manager):
+    """ Manager of the objects which are not being purged. """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_time__isnull=True)
+
+
+class PurgeableModel(CounterFieldsModel):
+    """ Base of the models whose contents are purged in the background (see api/purge.py).
+    deleted_time marks the objects being purged: objects hides them at once, all_objects includes them,
+    and the purges interrupted before their end are finished by the purge_pending command."""
+
+    deleted_time = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="deleted on")
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    update_only_fields = ("deleted_time",)
+
+    class Meta:
+        abstract = True
+
+
+class Project(PurgeableModel):
+    """ Project model for creating projects"""
 
     # Short project_types
     BACKEND = "B"
@@ -52,12 +94,29 @@ class Project(models.Model):
 
     created_time = models.DateTimeField(auto_now_add=True, verbose_name="created on")
     updated_time = models.DateTimeField(auto_now=True, verbose_name="updated on")
+    issue_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="number of issues")
+
+    counter_fields = ("issue_count",)
+
+    class Meta:
+        indexes = [
+            # projects list, ordered by creation time (cursor pagination on created_time and id).
+            models.Index(fields=["created_time", "id"], name="project_created_idx"),
+        ]
+        constraints = [
+            # an author cannot create two projects with the same name and type.
+            # the projects being purged do not count.
+            models.UniqueConstraint(
+                fields=["author", "name", "type"], condition=models.Q(deleted_time__isnull=True),
+                name="project_unique_author_name_type",
+            ),
+        ]
 
     def __str__(self):
         return f"Project: {self.name} ¦ Author: {self.author}"
 
 
-class Issue(models.Model):
+class Issue(PurgeableModel):
     """
     Issue model for creating issues.
     Issue is related to a project, the default state is ToDo.
@@ -65,8 +124,6 @@ class Issue(models.Model):
     The default assignee will be its author.
     """
 
-    objects = None
-
     # Short issue tags
     BUG = "B"
     FEATURE = "F"
@@ -134,6 +191,32 @@ class Issue(models.Model):
         verbose_name="issue assignee",
     )
     created_time = models.DateTimeField(auto_now_add=True, verbose_name="created on")
+    updated_time = models.DateTimeField(auto_now=True, verbose_name="updated on")
+    comment_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="number of comments")
+    # time of the latest comment written on the issue, or of its creation.
+    last_activity = models.DateTimeField(default=timezone.now, editable=False, verbose_name="last activity")
+
+    counter_fields = ("comment_count", "last_activity")
+
+    class Meta:
+        indexes = [
+            # issues list of a project, ordered by creation time.
+            models.Index(fields=["project", "created_time", "id"], name="issue_project_created_idx"),
+            # issues list filtered by ?state=, ?priority=, ?tag=, ?assignee= or ?author=, in the same order.
+            # Combined filters use the index of one of them and check the others on its rows.
+            models.Index(fields=["project", "state", "created_time", "id"], name="issue_project_state_idx"),
+            models.Index(fields=["project", "priority", "created_time", "id"], name="issue_project_priority_idx"),
+            models.Index(fields=["project", "tag", "created_time", "id"], name="issue_project_tag_idx"),
+            models.Index(fields=["project", "assignee", "created_time", "id"], name="issue_project_assignee_idx"),
+            models.Index(fields=["project", "author", "created_time", "id"], name="issue_project_author_idx"),
+        ]
+        constraints = [
+            # the same issue cannot be created twice in a project.
+            models.UniqueConstraint(
+                fields=["project", "name", "tag", "state", "priority"], condition=models.Q(deleted_time__isnull=True),
+                name="issue_unique_project_name",
+            ),
+        ]
 
     def __str__(self):
         return (
@@ -141,6 +224,38 @@ class Issue(models.Model):
         )
 
 
+class IssueCounter(models.Model):
+    """ Number of issues of a project per assignee, state, priority and tag,
+    maintained on every issue write when settings.ISSUE_STATS["COUNTERS"] is enabled."""
+
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name="issue_counters",
+        verbose_name="project",
+    )
+    assignee = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="issue_counters",
+        verbose_name="issue assignee",
+    )
+    state = models.CharField(max_length=2, choices=Issue.STATES, verbose_name="issue state")
+    priority = models.CharField(max_length=1, choices=Issue.PRIORITIES, verbose_name="issue priority")
+    tag = models.CharField(max_length=2, choices=Issue.TAGS, verbose_name="issue tag")
+    count = models.IntegerField(default=0, verbose_name="number of issues")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "assignee", "state", "priority", "tag"], name="issuecounter_unique_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.project} | {self.assignee}, {self.state}, {self.priority}, {self.tag}: {self.count}"
+
+
 class Comment(models.Model):
     """
     Comment model allowing to create comments from issues.
@@ -165,7 +280,18 @@ class Comment(models.Model):
         verbose_name="comment author",
     )
     created_time = models.DateTimeField(auto_now_add=True, verbose_name="created on")
+    updated_time = models.DateTimeField(auto_now=True, verbose_name="updated on")
     issue_url = models.URLField(blank=True, verbose_name="issue url")
 
+    class Meta:
+        indexes = [
+            # comments list of an issue, ordered by creation time.
+            models.Index(fields=["issue", "created_time", "id"], name="comment_issue_created_idx"),
+        ]
+        constraints = [
+            # comment names are unique in an issue.
+            models.UniqueConstraint(fields=["issue", "name"], name="comment_unique_issue_name"),
+        ]
+
     def __str__(self):
         return f"{self.name} | {self.issue}"
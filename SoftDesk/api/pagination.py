@@ -0,0 +1,46 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedTimeCursorPagination(CursorPagination):
+    """
+    Cursor based pagination, ordered by creation time and id.
+    Unlike the page number pagination, no count query is made and the database seeks directly to
+    the position stored in the cursor, so that deep pages cost as much as the first one.
+    https://www.django-rest-framework.org/api-guide/pagination/#cursorpagination
+    """
+    ordering = ("created_time", "id")
+
+
+class PaginationModeMixin:
+    """
+    Allows the viewsets to use the cursor pagination instead of the default page number pagination.
+    The mode is set per endpoint with the pagination_mode attribute,
+    and can be chosen per request with ?pagination=cursor or ?pagination=page.
+    """
+    PAGE = "page"
+    CURSOR = "cursor"
+
+    pagination_mode = PAGE
+
+    def get_cursor_ordering(self):
+        """
+        Returns the ordering of the cursor pagination: on creation time and id, ascending or descending.
+        """
+        return CreatedTimeCursorPagination.ordering
+
+    def get_pagination_mode(self):
+        mode = self.request.query_params.get("pagination", self.pagination_mode)
+        # the links to the next and previous pages only carry the cursor.
+        if mode == self.CURSOR or CreatedTimeCursorPagination.cursor_query_param in self.request.query_params:
+            return self.CURSOR
+        return self.PAGE
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.get_pagination_mode() == self.CURSOR:
+                self._paginator = CreatedTimeCursorPagination()
+                self._paginator.ordering = self.get_cursor_ordering()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
@@ -0,0 +1,72 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from rest_framework.exceptions import Throttled
+
+# Default settings of the admission control of the password hashes, overridden by
+# settings.PASSWORD_HASHING_ADMISSION.
+PASSWORD_HASHING_ADMISSION_DEFAULTS = {
+    # passwords hashed at once by the process; None for the number of CPUs.
+    "CONCURRENCY": None,
+    # passwords waiting to be hashed or checked beyond which new signups and logins are refused (429).
+    "MAX_PENDING": 64,
+}
+
+_slots = None
+_admitted = None
+_slots_lock = threading.Lock()
+
+
+def _get_semaphores():
+    global _slots, _admitted
+
+    if _slots is None:
+        with _slots_lock:
+            if _slots is None:
+                options = {
+                    **PASSWORD_HASHING_ADMISSION_DEFAULTS, **getattr(settings, "PASSWORD_HASHING_ADMISSION", {})
+                }
+                concurrency = options["CONCURRENCY"] or os.cpu_count() or 1
+                _admitted = threading.BoundedSemaphore(concurrency + options["MAX_PENDING"])
+                _slots = threading.BoundedSemaphore(concurrency)
+    return _slots, _admitted
+
+
+def reset_password_admission(setting="PASSWORD_HASHING_ADMISSION", **kwargs):
+    """
+    Drop the semaphores, so that they are built again from the settings.
+    Called when settings.PASSWORD_HASHING_ADMISSION changes.
+    """
+    global _slots, _admitted
+
+    if setting == "PASSWORD_HASHING_ADMISSION":
+        _slots = _admitted = None
+
+
+@contextmanager
+def password_hashing_slot(detail="Too many signups at the same time, please retry."):
+    """
+    Runs the block under the admission control of the password hashes.
+    At most CONCURRENCY passwords are hashed or checked at once, so that a burst of signups or logins does
+    not take every CPU from the other requests; MAX_PENDING more requests wait for a slot, blocking their
+    worker thread, and the requests beyond them are refused at once (429, with detail) instead of queueing.
+    """
+    slots, admitted = _get_semaphores()
+    if not admitted.acquire(blocking=False):
+        raise Throttled(wait=1, detail=detail)
+    try:
+        with slots:
+            yield
+    finally:
+        admitted.release()
+
+
+def hash_password(raw_password):
+    """
+    Hashes a password in the request's thread and returns the encoded hash, under admission control.
+    """
+    with password_hashing_slot():
+        return make_password(raw_password)
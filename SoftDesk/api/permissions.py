@@ -1,5 +1,5 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from api.models import Project
+from api.membership import get_membership
 
 
 class IsAuthorOrReadOnly(BasePermission):
@@ -17,7 +17,8 @@ class IsAuthorOrReadOnly(BasePermission):
         if request.method in SAFE_METHODS:
             return True
         # Write permissions are only allowed to the author of the object.
-        return obj.author == request.user
+        # compared by id, request.user being built from the token.
+        return obj.author_id == request.user.pk
 
 
 class IsProjectAuthor(BasePermission):
@@ -31,12 +32,10 @@ class IsProjectAuthor(BasePermission):
         view-level permission
         """
         # GET and POST
-        project_id = view.kwargs.get("project_pk")
-        project = Project.objects.get(pk=project_id)
+        membership = get_membership(request, view.kwargs.get("project_pk"))
 
         # check if the logged-in user is the author.
-        if request.user == project.author:
-            return True
+        return membership.is_author
 
 
 class IsProjectContributor(BasePermission):
@@ -50,12 +49,10 @@ class IsProjectContributor(BasePermission):
         view-level permission
         """
         # GET and POST
-        project_id = view.kwargs.get("project_pk")
-        project = Project.objects.get(pk=project_id)
+        membership = get_membership(request, view.kwargs.get("project_pk"))
 
         # check if the logged-in user is a contributor.
-        if request.user in project.contributors.all():
-            return True
+        return membership.is_contributor
 
 
 class UserPermission(BasePermission):
@@ -68,7 +65,7 @@ class UserPermission(BasePermission):
 
         if view.action in ["retrieve", "update", "partial_update"]:
             return (
-                    obj == request.user
+                    obj.pk == request.user.pk
             )  # Allow the user to retrieve, update or partial_update their own data
         else:
             return False  # For other actions, deny all requests
@@ -0,0 +1,213 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from api.instrumentation import request_timings
+
+# Default settings of the slow requests profiler, overridden by settings.PROFILING.
+PROFILING_DEFAULTS = {
+    "ENABLED": False,
+    # fraction of the api requests profiled with cProfile. The others are not slowed down.
+    "SAMPLE_RATE": 0.01,
+    # a report is written for the profiled requests slower than this.
+    "THRESHOLD_MS": 500,
+    # directory of the reports, default: <temporary directory>/softdesk-profiles
+    "DIRECTORY": None,
+    # the oldest reports are deleted beyond this number.
+    "MAX_REPORTS": 200,
+    # functions, stacks and SQL statements kept in a report.
+    "TOP": 25,
+}
+
+# stacks are followed up to this number of callers.
+STACK_DEPTH = 8
+
+# cProfile cannot profile two threads at once: the requests of the other threads are not sampled meanwhile.
+_profiler_lock = threading.Lock()
+
+
+def get_profiling_options():
+    return {**PROFILING_DEFAULTS, **getattr(settings, "PROFILING", {})}
+
+
+def get_reports_directory(options=None):
+    directory = (options or get_profiling_options())["DIRECTORY"]
+    return Path(directory or os.path.join(tempfile.gettempdir(), "softdesk-profiles"))
+
+
+def _function_name(function):
+    filename, line, name = function
+    if filename == "~":
+        # built-in functions, e.g. <method 'execute' of 'sqlite3.Cursor' objects>, without their address.
+        return re.sub(r" at 0x[0-9a-f]+", "", name)
+    return f"{filename}:{line}({name})"
+
+
+def profile_summary(profile, top):
+    """
+    Returns the top functions of a profile, by cumulative and own time, and the heaviest stacks:
+    from each of the functions with the most own time, up its most expensive callers.
+    """
+    stats = pstats.Stats(profile).stats
+
+    def function_row(function):
+        calls, primitive_calls, own, cumulative, callers = stats[function]
+        return {
+            "function": _function_name(function),
+            "calls": primitive_calls,
+            "own_ms": round(own * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+
+    def stack(function):
+        frames = [function]
+        while len(frames) < STACK_DEPTH:
+            callers = stats[frames[-1]][4]
+            callers = {caller: values for caller, values in callers.items() if caller not in frames}
+            if not callers:
+                break
+            # values of a caller: calls, primitive calls, own time, cumulative time.
+            frames.append(max(callers, key=lambda caller: callers[caller][3]))
+        return [_function_name(frame) for frame in frames]
+
+    by_cumulative = sorted(stats, key=lambda function: stats[function][3], reverse=True)[:top]
+    by_own = sorted(stats, key=lambda function: stats[function][2], reverse=True)[:top]
+    return {
+        "cumulative": [function_row(function) for function in by_cumulative],
+        "own": [function_row(function) for function in by_own],
+        "stacks": [
+            {"own_ms": round(stats[function][2] * 1000, 3), "frames": stack(function)}
+            for function in by_own[:min(top, 10)]
+        ],
+    }
+
+
+def sql_summary(statements, top):
+    """
+    Groups the statements of a request by SQL, the most expensive first.
+    """
+    grouped = {}
+    for sql, duration in statements:
+        count, total = grouped.get(sql, (0, 0.0))
+        grouped[sql] = (count + 1, total + duration)
+    rows = sorted(grouped.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return [{"sql": sql, "count": count, "total_ms": round(total * 1000, 3)} for sql, (count, total) in rows]
+
+
+def write_report(report, options=None):
+    """
+    Writes a report in the directory of the reports, then deletes the oldest ones beyond MAX_REPORTS.
+    The names of the reports start with their time in nanoseconds: they sort in chronological order.
+    """
+    options = options or get_profiling_options()
+    directory = get_reports_directory(options)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}.json"
+    temporary_path = path.with_suffix(".tmp")
+    with open(temporary_path, "w") as file:
+        json.dump(report, file)
+    # the reports are never read half written.
+    os.replace(temporary_path, path)
+
+    for old_path in list_reports(directory)[options["MAX_REPORTS"]:]:
+        old_path.unlink(missing_ok=True)
+    return path
+
+
+def list_reports(directory=None):
+    """
+    Returns the paths of the reports, the newest first.
+    """
+    directory = directory or get_reports_directory()
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob("*.json"), key=lambda path: path.name, reverse=True)
+
+
+def read_report(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+class SlowRequestProfilerMiddleware:
+    """
+    Profiles a sampled fraction of the requests with cProfile, collecting their SQL statements too,
+    and writes a report for the api requests slower than the threshold: top functions and stacks,
+    SQL statements and timings. Under ASGI, the event loop cannot be profiled with cProfile:
+    the reports of the sampled requests only have their SQL statements and timings.
+    Reports are listed and summarized with: python manage.py profile_reports
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def sampled(options):
+        return options["ENABLED"] and random.random() < options["SAMPLE_RATE"]
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        options = get_profiling_options()
+        if not self.sampled(options) or not _profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            with request_timings() as timings:
+                timings.statements = []
+                profile = cProfile.Profile()
+                start = time.perf_counter()
+                profile.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profile.disable()
+                duration = time.perf_counter() - start
+        finally:
+            _profiler_lock.release()
+        self.report(request, response, duration, timings, profile, options)
+        return response
+
+    async def __acall__(self, request):
+        options = get_profiling_options()
+        if not self.sampled(options):
+            return await self.get_response(request)
+        with request_timings() as timings:
+            timings.statements = []
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            duration = time.perf_counter() - start
+        self.report(request, response, duration, timings, None, options)
+        return response
+
+    @staticmethod
+    def report(request, response, duration, timings, profile, options):
+        statements = timings.statements
+        timings.statements = None
+        match = request.resolver_match
+        if match is None or "api" not in match.namespaces or duration * 1000 < options["THRESHOLD_MS"]:
+            return
+        write_report({
+            "time": time.time(),
+            "route": match.view_name,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "phases_ms": {phase: round(value * 1000, 3) for phase, value in timings.durations.items()},
+            "queries": len(statements),
+            "sql": sql_summary(statements, options["TOP"]),
+            "profile": profile_summary(profile, options["TOP"]) if profile is not None else None,
+        }, options)
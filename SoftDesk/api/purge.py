@@ -0,0 +1,154 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from api.counters import issues_written
+from api.models import Project, Issue, Comment
+from api.response_cache import invalidate_scopes, issue_scope, project_scope
+from api.search import remove_issue, remove_project
+
+logger = logging.getLogger(__name__)
+
+# Default settings of the purges, overridden by settings.PURGE.
+PURGE_DEFAULTS = {
+    # rows deleted per statement and per transaction.
+    "CHUNK_SIZE": 500,
+    # purge the contents of the deleted projects and issues in a background thread, started once the request
+    # is committed, the request returning immediately. False purges them in the request (e.g. for the tests).
+    "BACKGROUND": True,
+}
+
+
+def get_purge_option(name):
+    return {**PURGE_DEFAULTS, **getattr(settings, "PURGE", {})}[name]
+
+
+def delete_in_chunks(queryset):
+    """
+    Deletes the rows of the queryset by chunks of ids, each chunk in its own short transaction.
+    Unlike QuerySet.delete(), the rows are never loaded as model instances and no signal is sent:
+    the caller has to invalidate what depends on them. Returns the number of deleted rows.
+    """
+    model = queryset.model
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk_column = connection.ops.quote_name(model._meta.pk.column)
+    chunk_size = get_purge_option("CHUNK_SIZE")
+
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        placeholders = ", ".join(["%s"] * len(ids))
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {pk_column} IN ({placeholders})", ids)
+        deleted += len(ids)
+
+
+def _in_thread(purge, instance):
+    try:
+        purge(instance)
+    except Exception:
+        # the object stays marked as deleted: purge_pending() finishes it.
+        logger.exception("Purge of %r failed.", instance)
+    finally:
+        # the connection of the thread.
+        connection.close()
+
+
+def _run_purge(purge, instance, name):
+    """
+    Runs the purge in a background thread once the transaction of the request is committed,
+    or in the request if settings.PURGE["BACKGROUND"] is False or no thread can be started.
+    """
+    if not get_purge_option("BACKGROUND"):
+        purge(instance)
+        return
+
+    def start():
+        try:
+            threading.Thread(target=_in_thread, args=(purge, instance), name=name).start()
+        except RuntimeError:
+            logger.warning("No thread available for the purge of %r: purged in the request.", instance)
+            purge(instance)
+
+    transaction.on_commit(start)
+
+
+def _mark_deleted(instance):
+    """
+    Hides the object at once (see PurgeableModel), until its purge ends.
+    """
+    instance.deleted_time = timezone.now()
+    type(instance).all_objects.filter(pk=instance.pk).update(deleted_time=instance.deleted_time)
+
+
+def _purge_issue_contents(issue):
+    delete_in_chunks(Comment.objects.filter(issue_id=issue.pk))
+    # no comment left to collect: only the issue is deleted, sending its signals.
+    issue.delete()
+    # comments lists cached while the comments were deleted.
+    invalidate_scopes(issue_scope(issue.pk))
+
+
+def purge_issue(issue):
+    """
+    Deletes an issue and its comments.
+    Its search documents and cached comments lists are removed at once. An issue with more comments than a chunk
+    is marked as deleted, which hides it, then its comments are deleted by chunks, followed by the issue,
+    in a background thread if settings.PURGE["BACKGROUND"]. The other issues are deleted in the request,
+    their comments taking a single statement.
+    """
+    remove_issue(issue.pk)
+    invalidate_scopes(issue_scope(issue.pk))
+    if issue.comment_count <= get_purge_option("CHUNK_SIZE"):
+        _purge_issue_contents(issue)
+        return
+
+    _mark_deleted(issue)
+    # no longer counted nor listed; the deletion of the marked issue does not count it again.
+    issues_written(issue.project_id, -1)
+    invalidate_scopes(project_scope(issue.project_id))
+    _run_purge(_purge_issue_contents, issue, f"purge-issue-{issue.pk}")
+
+
+def _purge_project_contents(project):
+    issue_ids = Issue.all_objects.filter(project_id=project.pk)
+    comments = delete_in_chunks(Comment.objects.filter(issue_id__in=issue_ids))
+    issues = delete_in_chunks(Issue.all_objects.filter(project_id=project.pk))
+    remove_project(project.pk)
+    project.delete()
+    logger.info("Project %s purged: %s issues and %s comments deleted.", project.pk, issues, comments)
+
+
+def purge_project(project):
+    """
+    Deletes a project with its issues and comments.
+    The project is first marked as deleted and detached from its contributors, so that it immediately disappears
+    from their projects lists and nothing can be added to it anymore, not even contributors by its author.
+    Its contents are then deleted by chunks, in a background thread if settings.PURGE["BACKGROUND"].
+    """
+    _mark_deleted(project)
+    # sends m2m_changed: the memberships and projects lists are invalidated.
+    project.contributors.clear()
+    _run_purge(_purge_project_contents, project, f"purge-project-{project.pk}")
+
+
+def purge_pending(older_than):
+    """
+    Finishes the purges of the projects and issues marked as deleted more than older_than seconds ago,
+    interrupted e.g. by the restart of their worker. Returns the numbers of purged projects and issues.
+    """
+    marked_before = timezone.now() - timedelta(seconds=older_than)
+    projects = list(Project.all_objects.filter(deleted_time__lte=marked_before))
+    for project in projects:
+        _purge_project_contents(project)
+    # queried after the projects: their issues are deleted with them.
+    issues = list(Issue.all_objects.filter(deleted_time__lte=marked_before))
+    for issue in issues:
+        remove_issue(issue.pk)
+        _purge_issue_contents(issue)
+    return len(projects), len(issues)
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders newline delimited JSON: one JSON document per line.
+    Used by the streaming exports, which write the lines themselves; render() only renders error responses.
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    @staticmethod
+    def render_line(data):
+        return json.dumps(data, cls=JSONEncoder, ensure_ascii=False) + "\n"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return self.render_line(data).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders CSV rows.
+    Used by the streaming exports, which write the rows themselves; render() only renders error responses.
+    """
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    @staticmethod
+    def render_row(row):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(row)
+        return buffer.getvalue()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if not isinstance(data, dict):
+            data = {"detail": data}
+        rows = [self.render_row(data.keys()), self.render_row(data.values())]
+        return "".join(rows).encode(self.charset)
@@ -0,0 +1,135 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+# Default settings of the response cache, overridden by settings.RESPONSE_CACHE.
+RESPONSE_CACHE_DEFAULTS = {
+    "ENABLED": True,
+    # name of the cache in settings.CACHES storing the responses (locmem, Redis...).
+    "CACHE_ALIAS": "default",
+    # seconds after which a cached response is built again.
+    "TIMEOUT": 300,
+}
+
+# response headers stored with the cached content.
+CACHED_HEADERS = ("ETag", "Last-Modified", "Content-Type")
+
+
+def get_response_cache_options():
+    return {**RESPONSE_CACHE_DEFAULTS, **getattr(settings, "RESPONSE_CACHE", {})}
+
+
+def _version_key(scope):
+    return f"responses:version:{scope}"
+
+
+def get_scope_version(cache, scope):
+    """
+    Returns the current version of a scope, e.g. "project:3".
+    Versions are random tokens, not counters: if a version is evicted from the cache,
+    the new one can never match the keys of the responses cached before.
+    """
+    version = cache.get(_version_key(scope))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(_version_key(scope), version, None):
+            version = cache.get(_version_key(scope), version)
+    return version
+
+
+def invalidate_scopes(*scopes):
+    """
+    Gives a new version to the scopes, so that their cached responses are never served again.
+    The versions are changed immediately and once more after the commit of the current transaction,
+    otherwise a response built from the data of before the commit could be cached with the new version.
+    """
+    options = get_response_cache_options()
+    if not options["ENABLED"] or not scopes:
+        return
+
+    def bump():
+        caches[options["CACHE_ALIAS"]].set_many({_version_key(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def project_scope(project_id):
+    """ Lists nested in a project: its issues. """
+    return f"project:{project_id}"
+
+
+def issue_scope(issue_id):
+    """ Lists nested in an issue: its comments. """
+    return f"issue:{issue_id}"
+
+
+def user_scope(user_id):
+    """ Lists depending on the user: the user's projects. """
+    return f"user:{user_id}"
+
+
+class ResponseCacheMixin:
+    """
+    Caches the rendered responses of the list action, in the Django cache configured by settings.RESPONSE_CACHE.
+    Hits are served after the authentication and permission checks, without database query or serialization.
+    The key contains the version of the scope of the list (see get_response_cache_scope), changed by the signals
+    whenever an object of the scope is written, so that a stale response is never served.
+    Only JSON responses are cached: the browsable API pages contain the user's name and forms.
+    """
+
+    def get_response_cache_scope(self):
+        """
+        Returns the scope of the list and the part of the key identifying who can share the cached response.
+        """
+        raise NotImplementedError
+
+    def _response_cache_key(self, request):
+        options = get_response_cache_options()
+        if not options["ENABLED"] or request.accepted_renderer.format != "json":
+            return None
+
+        cache = caches[options["CACHE_ALIAS"]]
+        scope, audience = self.get_response_cache_scope()
+        # the version is read before the database, so that a response built from older data
+        # can only be stored with an older version.
+        version = get_scope_version(cache, scope)
+        parts = (audience, request.build_absolute_uri(), request.accepted_media_type)
+        digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+        return f"responses:{scope}:{version}:{digest}"
+
+    def list(self, request, *args, **kwargs):
+        key = self._response_cache_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+
+        options = get_response_cache_options()
+        cache = caches[options["CACHE_ALIAS"]]
+        cached = cache.get(key)
+        if cached is not None:
+            content, headers = cached
+            response = get_conditional_response(request._request, etag=headers.get("ETag"))
+            if response is None:
+                response = HttpResponse(content)
+            for header, value in headers.items():
+                response[header] = value
+            response["X-Response-Cache"] = "hit"
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            def store(rendered):
+                if rendered.status_code != 200:
+                    # e.g. turned into a 304 Not Modified.
+                    return
+                headers = {header: rendered[header] for header in CACHED_HEADERS if header in rendered}
+                cache.set(key, (rendered.content, headers), options["TIMEOUT"])
+
+            response.add_post_render_callback(store)
+        response["X-Response-Cache"] = "miss"
+        return response
@@ -0,0 +1,287 @@
+import re
+from collections import namedtuple
+from itertools import islice
+
+from django.db import connection
+from django.db.models import Q
+from api.models import Issue, Comment
+
+# Table of the search index, created by the 0007_search_index migration:
+# an FTS5 virtual table on SQLite, a table with a GIN indexed tsvector on PostgreSQL.
+SEARCH_TABLE = "api_search"
+# text search configuration of the PostgreSQL index, also used by the queries.
+POSTGRES_CONFIG = "english"
+
+ISSUE = "issue"
+COMMENT = "comment"
+
+SearchResult = namedtuple("SearchResult", ["type", "id", "issue_id", "project_id", "name", "rank"])
+
+
+def document_id(obj):
+    """
+    Id of the document of an issue or a comment in the index: issues get even ids and comments odd ones.
+    """
+    return obj.pk * 2 if isinstance(obj, Issue) else obj.pk * 2 + 1
+
+
+def _result(row, project_id):
+    doc_id, issue_id, name, rank = row
+    kind = ISSUE if doc_id % 2 == 0 else COMMENT
+    return SearchResult(kind, doc_id // 2, issue_id, project_id, name, rank)
+
+
+class SQLiteSearchBackend:
+    """
+    FTS5 index. Each document has a "keys" column holding the "p<project id> i<issue id>" tokens,
+    so that the search in a project and the removal of a project or an issue are index lookups too.
+    """
+
+    # the project is read from the issue, for the comments as well.
+    INSERT = (
+        f"INSERT INTO {SEARCH_TABLE} (rowid, keys, name, description, issue_id) "
+        "SELECT %s, 'p' || project_id || ' i' || id, %s, %s, id FROM api_issue WHERE id = %s"
+    )
+    MATCH = f"{SEARCH_TABLE} MATCH %s"
+    # the keys column does not count in the ranking, names weigh more than descriptions.
+    RANK = f"bm25({SEARCH_TABLE}, 0.0, 10.0, 1.0)"
+
+    def index(self, cursor, documents):
+        self.remove(cursor, [doc_id for doc_id, *values in documents])
+        cursor.executemany(self.INSERT, documents)
+
+    def remove(self, cursor, doc_ids):
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(doc_id,) for doc_id in doc_ids])
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    def _remove_key(self, cursor, key):
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT rowid FROM {SEARCH_TABLE} WHERE {self.MATCH})",
+            [f"keys:{key}"],
+        )
+
+    def remove_project(self, cursor, project_id):
+        self._remove_key(cursor, f"p{project_id}")
+
+    def remove_issue(self, cursor, issue_id):
+        self._remove_key(cursor, f"i{issue_id}")
+
+    @staticmethod
+    def _match(project_id, query):
+        # the terms are quoted: the FTS5 query syntax is not exposed to the users.
+        terms = " AND ".join(f'"{term}"' for term in re.findall(r"\w+", query))
+        return f"keys:p{project_id} AND {{name description}}:({terms})" if terms else None
+
+    def count(self, cursor, project_id, query):
+        match = self._match(project_id, query)
+        if match is None:
+            return 0
+        cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {self.MATCH}", [match])
+        return cursor.fetchone()[0]
+
+    def fetch(self, cursor, project_id, query, offset, limit):
+        match = self._match(project_id, query)
+        if match is None:
+            return []
+        cursor.execute(
+            f"SELECT rowid, issue_id, name, {self.RANK} FROM {SEARCH_TABLE} WHERE {self.MATCH} "
+            f"ORDER BY {self.RANK}, rowid LIMIT %s OFFSET %s",
+            [match, limit, offset],
+        )
+        # bm25() is lower for better matches.
+        return [_result((doc_id, issue_id, name, -rank), project_id) for doc_id, issue_id, name, rank in cursor]
+
+
+class PostgresSearchBackend:
+    """
+    Index of the tsvector of the names (weight A) and descriptions (weight B), with GIN and B-tree indexes.
+    """
+
+    VECTOR = (
+        f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B')"
+    )
+    INSERT = (
+        f"INSERT INTO {SEARCH_TABLE} (id, project_id, issue_id, name, document) "
+        f"SELECT %s, project_id, id, %s, {VECTOR} FROM api_issue WHERE id = %s "
+        "ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, document = EXCLUDED.document"
+    )
+    QUERY = f"plainto_tsquery('{POSTGRES_CONFIG}', %s)"
+
+    def index(self, cursor, documents):
+        cursor.executemany(
+            self.INSERT,
+            [(doc_id, name, name, description, issue_id) for doc_id, name, description, issue_id in documents],
+        )
+
+    def remove(self, cursor, doc_ids):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE id = ANY(%s)", [list(doc_ids)])
+
+    def clear(self, cursor):
+        cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+
+    def remove_project(self, cursor, project_id):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE project_id = %s", [project_id])
+
+    def remove_issue(self, cursor, issue_id):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE issue_id = %s", [issue_id])
+
+    def count(self, cursor, project_id, query):
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE project_id = %s AND document @@ {self.QUERY}",
+            [project_id, query],
+        )
+        return cursor.fetchone()[0]
+
+    def fetch(self, cursor, project_id, query, offset, limit):
+        cursor.execute(
+            f"SELECT id, issue_id, name, ts_rank(document, {self.QUERY}) AS rank FROM {SEARCH_TABLE} "
+            f"WHERE project_id = %s AND document @@ {self.QUERY} ORDER BY rank DESC, id LIMIT %s OFFSET %s",
+            [query, project_id, query, limit, offset],
+        )
+        return [_result(row, project_id) for row in cursor]
+
+
+class FallbackSearchBackend:
+    """
+    Without an index on the other databases: the issues, then the comments, matching every term.
+    """
+
+    def index(self, cursor, documents):
+        pass
+
+    def remove(self, cursor, doc_ids):
+        pass
+
+    def clear(self, cursor):
+        pass
+
+    def remove_project(self, cursor, project_id):
+        pass
+
+    def remove_issue(self, cursor, issue_id):
+        pass
+
+    @staticmethod
+    def _querysets(project_id, query):
+        terms = re.findall(r"\w+", query)
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(description__icontains=term)
+        issues = Issue.objects.filter(condition, project_id=project_id).order_by("id")
+        comments = Comment.objects.filter(condition, issue__project_id=project_id).order_by("id")
+        if not terms:
+            return issues.none(), comments.none()
+        return issues, comments
+
+    def count(self, cursor, project_id, query):
+        issues, comments = self._querysets(project_id, query)
+        return issues.count() + comments.count()
+
+    def fetch(self, cursor, project_id, query, offset, limit):
+        issues, comments = self._querysets(project_id, query)
+        rows = [
+            (issue.pk * 2, issue.pk, issue.name, 0.0)
+            for issue in issues.only("id", "name")[offset:offset + limit]
+        ]
+        if len(rows) < limit:
+            start = max(0, offset - issues.count())
+            rows += [
+                (comment.pk * 2 + 1, comment.issue_id, comment.name, 0.0)
+                for comment in comments.only("id", "issue_id", "name")[start:start + limit - len(rows)]
+            ]
+        return [_result(row, project_id) for row in rows]
+
+
+def get_search_backend():
+    if connection.vendor == "sqlite":
+        return SQLiteSearchBackend()
+    if connection.vendor == "postgresql":
+        return PostgresSearchBackend()
+    return FallbackSearchBackend()
+
+
+def index_objects(objects):
+    """
+    Adds or replaces the documents of issues and comments in the index.
+    """
+    documents = [
+        (document_id(obj), obj.name, obj.description, obj.pk if isinstance(obj, Issue) else obj.issue_id)
+        for obj in objects
+    ]
+    if documents:
+        with connection.cursor() as cursor:
+            get_search_backend().index(cursor, documents)
+
+
+def remove_objects(objects):
+    doc_ids = [document_id(obj) for obj in objects]
+    if doc_ids:
+        with connection.cursor() as cursor:
+            get_search_backend().remove(cursor, doc_ids)
+
+
+def remove_project(project_id):
+    """
+    Removes the documents of a project, whose issues and comments have been deleted without signals.
+    """
+    with connection.cursor() as cursor:
+        get_search_backend().remove_project(cursor, project_id)
+
+
+def remove_issue(issue_id):
+    """
+    Removes the documents of an issue and of its comments.
+    """
+    with connection.cursor() as cursor:
+        get_search_backend().remove_issue(cursor, issue_id)
+
+
+def rebuild_index(chunk_size=2000):
+    """
+    Indexes again every issue and comment, e.g. after rows have been written with raw SQL.
+    Returns the number of indexed documents.
+    """
+    with connection.cursor() as cursor:
+        get_search_backend().clear(cursor)
+
+    count = 0
+    querysets = (
+        Issue.objects.only("id", "name", "description"),
+        Comment.objects.only("id", "issue_id", "name", "description"),
+    )
+    for queryset in querysets:
+        objects = queryset.order_by("pk").iterator(chunk_size)
+        while batch := list(islice(objects, chunk_size)):
+            index_objects(batch)
+            count += len(batch)
+    return count
+
+
+class SearchResults:
+    """
+    Ranked results of a search in a project, fetched one page at a time:
+    the pagination only calls count() and slices them.
+    """
+
+    def __init__(self, project_id, query):
+        self.project_id = project_id
+        self.query = query
+        self.backend = get_search_backend()
+
+    def count(self):
+        with connection.cursor() as cursor:
+            return self.backend.count(cursor, self.project_id, self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError("Search results can only be sliced.")
+        offset = index.start or 0
+        if index.stop is None:
+            raise TypeError("Search results slices need an end.")
+        with connection.cursor() as cursor:
+            return self.backend.fetch(cursor, self.project_id, self.query, offset, max(0, index.stop - offset))
@@ -1,5 +1,72 @@
+from contextlib import nullcontext
+
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from api.password_admission import hash_password, password_hashing_slot
 from api.models import User, Project, Issue, Comment
+from api.search import ISSUE
+
+
+class UniqueConstraintSerializerMixin:
+    """
+    Enforces the uniqueness of an object with the model's UniqueConstraint instead of an extra query
+    before each write: the IntegrityError raised by the database, even for concurrent requests,
+    is turned into the validation error unique_error (400 response).
+    """
+    # fields of the model's UniqueConstraint
+    unique_fields = ()
+    unique_error = None
+
+    def create(self, validated_data):
+        return self._save_unique(None, validated_data, super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_unique(instance, validated_data, super().update, instance, validated_data)
+
+    def _unique_value(self, instance, validated_data, field):
+        if field in validated_data:
+            return validated_data[field]
+        if instance is not None:
+            return getattr(instance, field)
+        # a new object omitting a field with a default, e.g. the state of an issue.
+        return self.Meta.model._meta.get_field(field).get_default()
+
+    def _save_unique(self, instance, validated_data, save, *args):
+        # inside a transaction, a savepoint keeps the transaction usable after the error.
+        # In autocommit mode, only the failed statement is rolled back: no savepoint is needed.
+        in_transaction = transaction.get_connection().in_atomic_block
+        try:
+            with transaction.atomic() if in_transaction else nullcontext():
+                return save(*args)
+        except IntegrityError:
+            # only map the errors of the unique constraint, others are genuine errors.
+            lookup = {field: self._unique_value(instance, validated_data, field) for field in self.unique_fields}
+            duplicates = self.Meta.model.objects.filter(**lookup)
+            if instance is not None:
+                duplicates = duplicates.exclude(pk=instance.pk)
+            if not duplicates.exists():
+                raise
+            raise serializers.ValidationError(self.unique_error)
+
+
+# fields reversing a url for every serialized object.
+HYPERLINK_FIELDS = (serializers.HyperlinkedIdentityField, serializers.HyperlinkedRelatedField)
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Keeps only the fields passed with the fields argument (?fields= of the views), and drops the hyperlinks
+    when compact is set (?compact=true): each hyperlink costs a reverse() per object.
+    """
+
+    def __init__(self, *args, fields=None, compact=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in list(self.fields.items()):
+            if (fields is not None and name not in fields) or (compact and isinstance(field, HYPERLINK_FIELDS)):
+                self.fields.pop(name)
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -29,8 +96,8 @@ class UserCreateSerializer(serializers.ModelSerializer):
             contact_consent=validated_data["contact_consent"],
             data_share_consent=validated_data["data_share_consent"],
         )
-        # password encrypted
-        user.set_password(validated_data["password"])
+        # password encrypted, under the admission control of the hashes.
+        user.password = hash_password(validated_data["password"])
 
         # save the data in the database
         user.save()
@@ -38,11 +105,30 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         # save new data with encrypted passwords
-        instance.set_password(validated_data['password'])
+        instance.password = hash_password(validated_data['password'])
         instance.save()
         return instance
 
 
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Serializer used at login, adding the claims read by StatelessJWTAuthentication to the tokens.
+    The password is checked (and rehashed, if its hasher changed) under the admission control of the signups.
+    """
+
+    def validate(self, attrs):
+        with password_hashing_slot("Too many logins at the same time, please retry."):
+            return super().validate(attrs)
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["username"] = user.username
+        token["is_staff"] = user.is_staff
+        token["is_superuser"] = user.is_superuser
+        return token
+
+
 class UserListSerializer(serializers.ModelSerializer):
     """
     Serializer used to display all users in a list view.
@@ -67,30 +153,20 @@ class UserDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'username', 'password', 'date_joined', 'is_superuser']
 
 
-class ProjectCreateSerializer(serializers.ModelSerializer):
+class ProjectCreateSerializer(UniqueConstraintSerializerMixin, serializers.ModelSerializer):
     """
     Serializer used to create a project.
+    A validation error is raised if the author has already created the project.
     """
+    unique_fields = ("author_id", "name", "type")
+    unique_error = {api_settings.NON_FIELD_ERRORS_KEY: ["A project with the same name and type exists already!"]}
 
     class Meta:
         model = Project
         fields = ['id', 'name', 'description', 'type']
 
-    def validate(self, attrs):
-        """
-        Checks that the project has not already been created.
-        Else, a validation error is raised.
-        Reference = https://www.django-rest-framework.org/api-guide/serializers/#object-level-validation
-        """
-        if (
-                # access project attribute from the viewset
-                self.context["view"].project.filter(name=attrs["name"], type=attrs["type"]).exists()
-        ):
-            raise serializers.ValidationError("A project with the same name and type exists already!")
-        return attrs
-
 
-class ProjectListSerializer(serializers.ModelSerializer):
+class ProjectListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer to display a list of projects.
     """
@@ -99,10 +175,10 @@ class ProjectListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Project
-        fields = ['id', 'name', 'type', 'author', 'contributors', 'url']
+        fields = ['id', 'name', 'type', 'author', 'contributors', 'issue_count', 'url']
 
 
-class ProjectDetailSerializer(serializers.ModelSerializer):
+class ProjectDetailSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer to display the details of a given project.
     """
@@ -112,6 +188,26 @@ class ProjectDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'type', 'description', 'author', 'contributors', 'created_time']
 
 
+class ProjectListCountSerializer(ProjectListSerializer):
+    """
+    Serializer to display a list of projects with their number of contributors.
+    """
+    contributors_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ProjectListSerializer.Meta):
+        fields = ['id', 'name', 'type', 'author', 'contributors_count', 'issue_count', 'url']
+
+
+class ProjectDetailCountSerializer(ProjectDetailSerializer):
+    """
+    Serializer to display the details of a given project with its number of contributors.
+    """
+    contributors_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ProjectDetailSerializer.Meta):
+        fields = ['id', 'name', 'type', 'description', 'author', 'contributors_count', 'created_time']
+
+
 class ContributorCreateSerializer(serializers.ModelSerializer):
     """
     Serializer used to display all contributors of a project in a list view
@@ -145,6 +241,45 @@ class ContributorCreateSerializer(serializers.ModelSerializer):
         return user
 
 
+class ContributorBulkSerializer(serializers.Serializer):
+    """
+    Serializer used to add and remove several contributors of a project at once.
+    All the users are checked with one query on the users and one on the project's contributors.
+    """
+    add = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=10000)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=10000)
+
+    def validate(self, attrs):
+        add, remove = set(attrs["add"]), set(attrs["remove"])
+        if not add and not remove:
+            raise serializers.ValidationError("Give the ids of the users to add or to remove.")
+        if add & remove:
+            raise serializers.ValidationError("A user cannot be both added and removed.")
+
+        project = self.context["view"].project
+        users = dict(User.objects.filter(pk__in=add | remove).values_list("pk", "is_superuser"))
+        contributors = set(
+            Project.contributors.through.objects.filter(project_id=project.pk, user_id__in=add | remove)
+            .values_list("user_id", flat=True)
+        )
+
+        errors = {}
+        add_errors = {
+            **{pk: "User does not exist!" for pk in add if pk not in users},
+            **{pk: "A Superuser cannot be added as contributor." for pk in add if users.get(pk)},
+            **{pk: "This user is already a contributor of this project." for pk in add & contributors},
+        }
+        if add_errors:
+            errors["add"] = add_errors
+        remove_errors = {pk: "This user is not a contributor of this project." for pk in remove - contributors}
+        if remove_errors:
+            errors["remove"] = remove_errors
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return {"add": sorted(add), "remove": sorted(remove)}
+
+
 class ContributorListSerializer(serializers.ModelSerializer):
     """
     Serializer used to display all contributors of a project in a list view
@@ -167,65 +302,91 @@ class ContributorDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'age', 'contact_consent', 'data_share_consent']
 
 
-class IssueCreateSerializer(serializers.ModelSerializer):
+class IssueCreateSerializer(UniqueConstraintSerializerMixin, serializers.ModelSerializer):
     """
     Serializer to create and edit an Issue.
+    A validation error is raised if the issue has already been created.
     """
+    unique_fields = ("project_id", "name", "tag", "state", "priority")
+    unique_error = {api_settings.NON_FIELD_ERRORS_KEY: ["This issue exists already!"]}
+
+    class Meta:
+        model = Issue
+        fields = ['id', 'name', 'description', 'tag', 'state', 'priority', 'assignee']
+
+
+class IssueBulkSerializer(serializers.ModelSerializer):
+    """
+    Serializer validating one issue of a bulk creation or update.
+    The assignees of all the issues are checked at once by the viewset.
+    """
+    assignee = serializers.IntegerField(source="assignee_id")
 
     class Meta:
         model = Issue
         fields = ['id', 'name', 'description', 'tag', 'state', 'priority', 'assignee']
 
-    def validate(self, attrs):
-        """
-        Checks that the issue has not already been created.
-        Else, a validation error is raised.
-        """
-        if (self.context["view"].issue.filter(name=attrs["name"], tag=attrs["tag"], state=attrs["state"],
-                                              priority=attrs["priority"]).exists()):
-            raise serializers.ValidationError("This issue exists already!")
 
-        return attrs
+class IssueFilterSerializer(serializers.Serializer):
+    """
+    Serializer validating the query parameters filtering and ordering the issues list.
+    """
+    ORDERINGS = ["created_time", "-created_time", "priority", "-priority"]
 
+    state = serializers.ChoiceField(choices=Issue.STATES, required=False)
+    priority = serializers.ChoiceField(choices=Issue.PRIORITIES, required=False)
+    tag = serializers.ChoiceField(choices=Issue.TAGS, required=False)
+    assignee = serializers.IntegerField(source="assignee_id", required=False)
+    author = serializers.IntegerField(source="author_id", required=False)
+    ordering = serializers.ChoiceField(choices=ORDERINGS, default="created_time")
 
-class IssueListSerializer(serializers.ModelSerializer):
+
+class IssueListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer to display issues in list view.
     """
 
     class Meta:
         model = Issue
-        fields = ['id', 'name', 'description', 'tag', 'state', 'priority', 'author']
+        fields = ['id', 'name', 'description', 'tag', 'state', 'priority', 'author', 'comment_count',
+                  'last_activity']
 
 
-class IssueDetailSerializer(serializers.ModelSerializer):
+class IssueDetailSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer to display the details of an Issue.
     """
 
     class Meta:
         model = Issue
-        fields = ['id', 'name', 'description', 'tag', 'state', 'priority', 'created_time',
+        fields = ['id', 'name', 'description', 'tag', 'state', 'priority', 'created_time', 'updated_time',
                   'author', 'assignee', 'project']
 
 
-class CommentCreateSerializer(serializers.ModelSerializer):
+class CommentCreateSerializer(UniqueConstraintSerializerMixin, serializers.ModelSerializer):
     """
     Serializer used to create a new Comment for an Issue.
+    A validation error is raised if the comment name is already used in the issue.
     """
+    unique_fields = ("issue_id", "name")
+    unique_error = {"name": ["This comment name exists already."]}
 
     class Meta:
         model = Comment
         fields = ['id', 'name', 'description']
 
-    def validate_name(self, value):
-        if self.context["view"].comment.filter(name=value).exists():
-            raise serializers.ValidationError("This comment name exists already.")
 
-        return value
+class CommentBulkSerializer(serializers.ModelSerializer):
+    """
+    Serializer validating one comment of a bulk creation or update.
+    """
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'name', 'description']
 
 
-class CommentListSerializer(serializers.ModelSerializer):
+class CommentListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer used to display all comments of an Issue in list view.
     """
@@ -235,11 +396,30 @@ class CommentListSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'author']
 
 
-class CommentDetailSerializer(serializers.ModelSerializer):
+class CommentDetailSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer to display the details of a comment.
     """
 
     class Meta:
         model = Comment
-        fields = ['id', 'name', 'description', 'created_time', 'author', 'issue', 'issue_url']
+        fields = ['id', 'name', 'description', 'created_time', 'updated_time', 'author', 'issue', 'issue_url']
+
+
+class SearchResultSerializer(serializers.Serializer):
+    """
+    Serializer to display an issue or a comment found by a search in a project.
+    """
+    type = serializers.CharField()
+    id = serializers.IntegerField()
+    issue = serializers.IntegerField(source="issue_id")
+    name = serializers.CharField()
+    rank = serializers.FloatField()
+    url = serializers.SerializerMethodField()
+
+    def get_url(self, result):
+        if result.type == ISSUE:
+            kwargs = {"project_pk": result.project_id, "pk": result.id}
+            return reverse("api:project-issue-detail", kwargs=kwargs, request=self.context.get("request"))
+        kwargs = {"project_pk": result.project_id, "issue_pk": result.issue_id, "pk": result.id}
+        return reverse("api:issue-comment-detail", kwargs=kwargs, request=self.context.get("request"))
@@ -0,0 +1,180 @@
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from api.authentication import invalidate_cached_user, reset_user_cache
+from api.counters import comments_written, issues_written
+from api.database import configure_connection
+from api.instrumentation import instrument_connection
+from api.membership import invalidate_project_memberships, reset_membership_cache
+from api.password_admission import reset_password_admission
+from api.models import User, Project, Issue, Comment
+from api.response_cache import invalidate_scopes, issue_scope, project_scope, user_scope
+from api.search import index_objects, remove_objects
+from api.stats import count_issue_changes, counters_enabled, remember_counter_key
+
+
+def _contributors_ids(project_ids):
+    return set(
+        Project.contributors.through.objects.filter(project_id__in=project_ids).values_list("user_id", flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=Project.contributors.through)
+def contributors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidates the cached memberships and responses when contributors are added to or removed from a project.
+    """
+    if action == "pre_clear":
+        # the projects and users concerned are not known anymore after the clear.
+        if reverse:
+            instance._cleared_project_ids = list(instance.project_contributors.values_list("pk", flat=True))
+        else:
+            instance._cleared_user_ids = _contributors_ids([instance.pk])
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        # project.contributors.add(), remove() or clear(): pk_set contains the users ids.
+        project_ids = [instance.pk]
+        user_ids = set(pk_set or ()) | getattr(instance, "_cleared_user_ids", set())
+    else:
+        # user.project_contributors.add(), remove() or clear(): pk_set contains the projects ids.
+        project_ids = list(pk_set) if pk_set is not None else getattr(instance, "_cleared_project_ids", [])
+        user_ids = {instance.pk}
+
+    for project_id in project_ids:
+        invalidate_project_memberships(project_id)
+    # the contributors are part of the project's representation: its ETag must change,
+    # as well as the projects list of every contributor.
+    Project.objects.filter(pk__in=project_ids).update(updated_time=timezone.now())
+    user_ids |= _contributors_ids(project_ids)
+    invalidate_scopes(*[user_scope(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=Project)
+@receiver(pre_delete, sender=Project)
+def project_changed(sender, instance, created=False, **kwargs):
+    """
+    Invalidates the cached memberships and responses when a project is updated (its author may change)
+    or is about to be deleted.
+    """
+    if not created:
+        invalidate_project_memberships(instance.pk)
+        invalidate_scopes(*[user_scope(user_id) for user_id in _contributors_ids([instance.pk])])
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    invalidate_project_memberships(instance.pk)
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+def issue_changed(sender, instance, **kwargs):
+    """
+    Invalidates the cached issues lists of the project.
+    """
+    invalidate_scopes(project_scope(instance.project_id))
+
+
+@receiver(post_init, sender=Issue)
+def issue_loaded(sender, instance, **kwargs):
+    if counters_enabled():
+        remember_counter_key(instance)
+
+
+@receiver(post_save, sender=Issue)
+def issue_saved(sender, instance, **kwargs):
+    """
+    Moves the issue to the counter of its new assignee, state, priority and tag.
+    """
+    if counters_enabled():
+        count_issue_changes([instance])
+
+
+@receiver(post_delete, sender=Issue)
+def issue_deleted(sender, instance, **kwargs):
+    if counters_enabled():
+        count_issue_changes([instance], deleted=True)
+
+
+@receiver(post_save, sender=Issue)
+def issue_counted(sender, instance, created, **kwargs):
+    """
+    Counts the new issue in its project's issue_count.
+    """
+    if created:
+        issues_written(instance.project_id, 1)
+
+
+@receiver(post_delete, sender=Issue)
+def issue_uncounted(sender, instance, **kwargs):
+    # a purged issue is uncounted when it is marked as deleted (see api/purge.py).
+    if instance.deleted_time is None:
+        issues_written(instance.project_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_counted(sender, instance, created, **kwargs):
+    """
+    Counts the new comment in its issue's comment_count, and moves the issue's last_activity.
+    """
+    comments_written(instance.issue_id, 1 if created else 0)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncounted(sender, instance, **kwargs):
+    comments_written(instance.issue_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    """
+    Invalidates the cached comments lists of the issue.
+    """
+    invalidate_scopes(issue_scope(instance.issue_id))
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_save, sender=Comment)
+def index_search_document(sender, instance, update_fields=None, **kwargs):
+    """
+    Keeps the search index in sync with the names and descriptions of the issues and comments.
+    """
+    if update_fields is None or {"name", "description"} & set(update_fields):
+        index_objects([instance])
+
+
+@receiver(post_delete, sender=Issue)
+@receiver(post_delete, sender=Comment)
+def remove_search_document(sender, instance, **kwargs):
+    remove_objects([instance])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    Removes the user from the authenticated users cache of this process.
+    """
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(setting_changed)
+def cache_setting_changed(**kwargs):
+    reset_membership_cache(**kwargs)
+    reset_user_cache(**kwargs)
+    reset_password_admission(**kwargs)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    """
+    Sets the pragmas of the new SQLite connections, and installs the query timer of the request instrumentation.
+    """
+    configure_connection(connection)
+    instrument_connection(connection)
@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from api.models import Issue, IssueCounter
+
+# Default settings of the project statistics, overridden by settings.ISSUE_STATS.
+ISSUE_STATS_DEFAULTS = {
+    # maintain the IssueCounter table on every issue write, and read the statistics from it.
+    # After enabling it on an existing database, run: python manage.py rebuild_issue_counters
+    "COUNTERS": False,
+}
+
+# fields the issues are counted by, with their choices.
+COUNTED_FIELDS = {
+    "state": Issue.STATES,
+    "priority": Issue.PRIORITIES,
+    "tag": Issue.TAGS,
+}
+# attributes identifying the counter of an issue.
+COUNTER_KEY = ("project_id", "assignee_id", "state", "priority", "tag")
+# counter key of an issue loaded without all the COUNTER_KEY fields.
+UNKNOWN = object()
+
+
+def counters_enabled():
+    return {**ISSUE_STATS_DEFAULTS, **getattr(settings, "ISSUE_STATS", {})}["COUNTERS"]
+
+
+def _empty_stats():
+    stats = {"total": 0}
+    for field, choices in COUNTED_FIELDS.items():
+        stats[field] = {value: 0 for value, label in choices}
+    stats["assignee"] = {}
+    return stats
+
+
+def _sorted_assignees(stats):
+    stats["assignee"] = [
+        {"assignee": assignee_id, "count": count}
+        for assignee_id, count in sorted(stats["assignee"].items(), key=lambda item: (-item[1], item[0]))
+    ]
+    return stats
+
+
+def aggregate_stats(project_id):
+    """
+    Counts the issues of a project by state, priority, tag and assignee with a single query:
+    one row per assignee, with a conditional count per choice of each field.
+    """
+    aggregates = {
+        f"{field}_{value}": Count("pk", filter=Q(**{field: value}))
+        for field, choices in COUNTED_FIELDS.items() for value, label in choices
+    }
+    rows = (
+        Issue.objects.filter(project_id=project_id)
+        .order_by()
+        .values("assignee_id")
+        .annotate(total=Count("pk"), **aggregates)
+    )
+
+    stats = _empty_stats()
+    for row in rows:
+        stats["total"] += row["total"]
+        stats["assignee"][row["assignee_id"]] = row["total"]
+        for field, choices in COUNTED_FIELDS.items():
+            for value, label in choices:
+                stats[field][value] += row[f"{field}_{value}"]
+    return _sorted_assignees(stats)
+
+
+def counter_stats(project_id):
+    """
+    Reads the statistics of a project from its counters: the cost depends on the number of
+    (assignee, state, priority, tag) combinations, not on the number of issues.
+    """
+    stats = _empty_stats()
+    counters = IssueCounter.objects.filter(project_id=project_id, count__gt=0).values_list(
+        "assignee_id", "state", "priority", "tag", "count"
+    )
+    for assignee_id, state, priority, tag, count in counters:
+        stats["total"] += count
+        stats["assignee"][assignee_id] = stats["assignee"].get(assignee_id, 0) + count
+        stats["state"][state] += count
+        stats["priority"][priority] += count
+        stats["tag"][tag] += count
+    return _sorted_assignees(stats)
+
+
+def project_stats(project_id):
+    if counters_enabled():
+        return counter_stats(project_id)
+    return aggregate_stats(project_id)
+
+
+def counter_key(issue):
+    """
+    Returns the key of the counter of an issue, or UNKNOWN if some of its fields were not loaded.
+    """
+    values = tuple(issue.__dict__.get(attribute) for attribute in COUNTER_KEY)
+    return UNKNOWN if None in values else values
+
+
+def remember_counter_key(issue):
+    """
+    Stores the key an issue is counted with when it is loaded, to find the counter to decrement when it changes.
+    A new issue is not counted yet.
+    """
+    issue._counter_key = counter_key(issue) if issue.pk is not None else None
+
+
+def _add(key, delta):
+    lookup = dict(zip(COUNTER_KEY, key))
+    if IssueCounter.objects.filter(**lookup).update(count=F("count") + delta) or delta < 0:
+        return
+    try:
+        # in a savepoint: the counter may be created concurrently.
+        with transaction.atomic():
+            IssueCounter.objects.create(**lookup, count=delta)
+    except IntegrityError:
+        IssueCounter.objects.filter(**lookup).update(count=F("count") + delta)
+
+
+def count_issue_changes(issues, deleted=False):
+    """
+    Moves the saved or deleted issues between their counters, from the key they were loaded
+    or last counted with (issue._counter_key) to their current one.
+    """
+    deltas, unknown_projects = {}, set()
+    for issue in issues:
+        old_key = getattr(issue, "_counter_key", None)
+        new_key = None if deleted else counter_key(issue)
+        if old_key is UNKNOWN or new_key is UNKNOWN:
+            unknown_projects.add(issue.project_id)
+            continue
+        if old_key == new_key:
+            continue
+        if old_key is not None:
+            deltas[old_key] = deltas.get(old_key, 0) - 1
+        if new_key is not None:
+            deltas[new_key] = deltas.get(new_key, 0) + 1
+        issue._counter_key = new_key
+    for key, delta in deltas.items():
+        if delta and key[0] not in unknown_projects:
+            _add(key, delta)
+    for project_id in unknown_projects:
+        rebuild_counters(project_id)
+
+
+def rebuild_counters(project_id=None):
+    """
+    Computes the counters again from the issues, of one project or of all of them.
+    """
+    issues = Issue.objects.order_by()
+    counters = IssueCounter.objects.all()
+    if project_id is not None:
+        issues = issues.filter(project_id=project_id)
+        counters = counters.filter(project_id=project_id)
+    rows = issues.values(*COUNTER_KEY).annotate(count=Count("pk"))
+    with transaction.atomic():
+        counters.delete()
+        return len(IssueCounter.objects.bulk_create([IssueCounter(**row) for row in rows], batch_size=500))
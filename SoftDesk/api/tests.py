@@ -1,3 +1,822 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APITransactionTestCase
+from api.benchmarking import access_token
+from api.counters import repair_counters
+from api import membership
+from api.instrumentation import InstrumentedViewMixin, request_timings
+from api.models import User, Project, Issue, Comment
+from api.password_admission import _get_semaphores
+from api.purge import _in_thread, purge_pending
+from api.search import SearchResults
+from api.serializers import IssueFilterSerializer
+from api.views import filter_issues
+
+
+@override_settings(INSTRUMENTATION={"LOG": False}, RESPONSE_CACHE={"ENABLED": False})
+class ApiTestCase(APITestCase):
+    """
+    Base of the API tests: a project of the user "author", who is authenticated.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username="author", email="author@example.com", age=30)
+        cls.project = Project.objects.create(name="Project", description="d", type=Project.BACKEND, author=cls.author)
+        cls.project.contributors.add(cls.author)
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+
+    def issues_url(self, project=None):
+        return f"/api/projects/{(project or self.project).pk}/issues/"
+
+    def issue_data(self, **data):
+        return {"name": "Issue", "description": "d", "tag": Issue.BUG, "priority": Issue.LOW,
+                "assignee": self.author.pk, **data}
+
+
+class UniqueConstraintTests(ApiTestCase):
+
+    def test_duplicate_project_is_rejected(self):
+        data = {"name": "Project", "description": "d", "type": Project.BACKEND}
+        response = self.client.post("/api/projects/", data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Project.objects.filter(name="Project").count(), 1)
+
+    def test_duplicate_issue_without_the_defaulted_state_is_rejected(self):
+        self.assertEqual(self.client.post(self.issues_url(), self.issue_data(), format="json").status_code, 201)
+        response = self.client.post(self.issues_url(), self.issue_data(), format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"non_field_errors": ["This issue exists already!"]})
+
+    def test_duplicate_comment_is_rejected(self):
+        issue = Issue.objects.create(
+            name="Issue", description="d", tag=Issue.BUG, priority=Issue.LOW, project=self.project,
+            author=self.author, assignee=self.author,
+        )
+        url = f"{self.issues_url()}{issue.pk}/comments/"
+        self.assertEqual(self.client.post(url, {"name": "C", "description": "d"}, format="json").status_code, 201)
+        response = self.client.post(url, {"name": "C", "description": "d"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("name", response.json())
+
+
+class IssueFilterTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create(username="other", email="other@example.com", age=30)
+        cls.project.contributors.add(cls.other)
+        for name, priority, state, assignee in [
+            ("A", Issue.LOW, Issue.TODO, cls.author),
+            ("B", Issue.HIGH, Issue.TODO, cls.other),
+            ("C", Issue.MEDIUM, Issue.COMPLETED, cls.author),
+        ]:
+            Issue.objects.create(
+                name=name, description="d", tag=Issue.BUG, priority=priority, state=state, project=cls.project,
+                author=cls.author, assignee=assignee,
+            )
+
+    def setUp(self):
+        super().setUp()
+        # the async views only authenticate with a JWT.
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token(self.author)}")
+
+    def names(self, url, query):
+        response = self.client.get(url, query)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [issue["name"] for issue in response.json()["results"]]
+
+    def test_filters_and_ordering(self):
+        for url in (self.issues_url(), f"/api/async/projects/{self.project.pk}/issues/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.names(url, {"state": Issue.TODO}), ["A", "B"])
+                self.assertEqual(self.names(url, {"assignee": self.author.pk}), ["A", "C"])
+                self.assertEqual(self.names(url, {"ordering": "-priority"}), ["B", "C", "A"])
+                self.assertEqual(self.names(url, {"ordering": "-created_time"}), ["C", "B", "A"])
+
+    def test_invalid_filters_are_rejected(self):
+        for url in (self.issues_url(), f"/api/async/projects/{self.project.pk}/issues/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, {"state": "Z"}).status_code, 400)
+                self.assertEqual(self.client.get(url, {"ordering": "name"}).status_code, 400)
+                self.assertEqual(self.client.get(url, {"fields": "id,unknown"}).status_code, 400)
+
+    def test_async_fields(self):
+        response = self.client.get(f"/api/async/projects/{self.project.pk}/issues/", {"fields": "id,name"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()["results"][0]), {"id", "name"})
+
+    def test_async_cursor_pagination_is_rejected(self):
+        url = f"/api/async/projects/{self.project.pk}/issues/"
+        self.assertEqual(self.client.get(url, {"pagination": "cursor"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"pagination": "page"}).status_code, 200)
+
+
+class ListIndexTestsMixin:
+    """
+    The list queries of the viewsets are served by the indexes of the models, read from QuerySet.explain().
+    """
+
+    def assertUsesIndex(self, queryset, index):
+        raise NotImplementedError
+
+    def issues(self, **query):
+        serializer = IssueFilterSerializer(data=query)
+        serializer.is_valid(raise_exception=True)
+        return filter_issues(Issue.objects.filter(project_id=1), serializer.validated_data)
+
+    def test_issue_list(self):
+        self.assertUsesIndex(self.issues(), "issue_project_created_idx")
+        self.assertUsesIndex(self.issues(ordering="-created_time"), "issue_project_created_idx")
+
+    def test_filtered_issue_list(self):
+        for query, index in [
+            ({"state": Issue.TODO}, "issue_project_state_idx"),
+            ({"priority": Issue.HIGH}, "issue_project_priority_idx"),
+            ({"tag": Issue.BUG}, "issue_project_tag_idx"),
+            ({"assignee": 1}, "issue_project_assignee_idx"),
+            ({"author": 1}, "issue_project_author_idx"),
+        ]:
+            with self.subTest(query=query):
+                self.assertUsesIndex(self.issues(**query), index)
+
+    def test_comment_list(self):
+        comments = Comment.objects.filter(issue_id=1).order_by("created_time", "id")
+        self.assertUsesIndex(comments, "comment_issue_created_idx")
+
+    def test_project_ordering(self):
+        self.assertUsesIndex(Project.objects.order_by("created_time", "id"), "project_created_idx")
+
+
+@skipUnless(connection.vendor == "sqlite", "reads the query plans of SQLite")
+class ListIndexTests(ListIndexTestsMixin, TestCase):
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f"USING INDEX {index}", plan)
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan)
+
+
+@skipUnless(connection.vendor == "postgresql", "reads the query plans of PostgreSQL")
+class PostgresListIndexTests(ListIndexTestsMixin, TestCase):
+
+    def setUp(self):
+        # the tables are empty: without these, the planner prefers reading and sorting them.
+        with connection.cursor() as cursor:
+            for option in ("enable_seqscan", "enable_bitmapscan", "enable_sort"):
+                cursor.execute(f"SET LOCAL {option} = off")
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertRegex(plan, rf"Index (Only )?Scan (Backward )?using {index} on")
+        self.assertNotRegex(plan, r"\bSort\b")
+
+
+class CursorPaginationTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        issues = Issue.objects.bulk_create(
+            Issue(name=f"Issue {index}", description="d", tag=Issue.BUG, priority=Issue.LOW, project=cls.project,
+                  author=cls.author, assignee=cls.author)
+            for index in range(25)
+        )
+        cls.ids = sorted(issue.pk for issue in issues)
+        # ties on the creation time: the id orders the issues.
+        Issue.objects.filter(pk__in=cls.ids[5:20]).update(created_time=Issue.objects.get(pk=cls.ids[5]).created_time)
+
+    def traverse(self, query):
+        ids, url = [], self.issues_url()
+        while url:
+            response = self.client.get(url, query)
+            self.assertEqual(response.status_code, 200, response.content)
+            data = response.json()
+            self.assertNotIn("count", data)
+            ids += [issue["id"] for issue in data["results"]]
+            # the next links carry the cursor and the other query parameters.
+            url, query = data["next"], None
+        return ids
+
+    def test_next_links_over_ties(self):
+        self.assertEqual(self.traverse({"pagination": "cursor"}), self.ids)
+
+    def test_descending_creation_time(self):
+        self.assertEqual(self.traverse({"pagination": "cursor", "ordering": "-created_time"}), self.ids[::-1])
+
+    def test_priority_ordering_is_rejected(self):
+        response = self.client.get(self.issues_url(), {"pagination": "cursor", "ordering": "priority"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ordering", response.json())
+
+
+class BulkTests(ApiTestCase):
+
+    def test_partial_success_is_a_multi_status(self):
+        items = [self.issue_data(name="A"), self.issue_data(name="B", priority="Z"), self.issue_data(name="C")]
+        response = self.client.post(f"{self.issues_url()}bulk/", items, format="json")
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["results"]
+        self.assertEqual([(result["index"], result["status"]) for result in results], [(0, 201), (1, 400), (2, 201)])
+        self.assertIn("priority", results[1]["errors"])
+        self.assertEqual(
+            sorted(Issue.objects.filter(pk__in=[results[0]["id"], results[2]["id"]]).values_list("name", flat=True)),
+            ["A", "C"],
+        )
+
+    def test_success_is_a_created(self):
+        items = [self.issue_data(name="A"), self.issue_data(name="B")]
+        response = self.client.post(f"{self.issues_url()}bulk/", items, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Issue.objects.filter(project=self.project).count(), 2)
+
+
+@override_settings(PURGE={"BACKGROUND": False})
+class CounterTests(ApiTestCase):
+
+    def issue_count(self):
+        return self.client.get("/api/projects/").json()["results"][0]["issue_count"]
+
+    def comment_count(self):
+        return self.client.get(self.issues_url()).json()["results"][0]["comment_count"]
+
+    def create_issue(self):
+        return Issue.objects.create(
+            name="Issue", description="d", tag=Issue.BUG, priority=Issue.LOW, project=self.project,
+            author=self.author, assignee=self.author,
+        )
+
+    def test_issue_count(self):
+        self.assertEqual(self.client.post(self.issues_url(), self.issue_data(), format="json").status_code, 201)
+        self.assertEqual(self.issue_count(), 1)
+        items = [self.issue_data(name="A"), self.issue_data(name="B")]
+        response = self.client.post(f"{self.issues_url()}bulk/", items, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.issue_count(), 3)
+        issue = Issue.objects.get(name="A")
+        self.assertEqual(self.client.delete(f"{self.issues_url()}{issue.pk}/").status_code, 204)
+        self.assertEqual(self.issue_count(), 2)
+
+    def test_comment_count(self):
+        issue = self.create_issue()
+        url = f"{self.issues_url()}{issue.pk}/comments/"
+        self.assertEqual(self.client.post(url, {"name": "C", "description": "d"}, format="json").status_code, 201)
+        self.assertEqual(self.comment_count(), 1)
+        items = [{"name": "A", "description": "d"}, {"name": "B", "description": "d"}]
+        self.assertEqual(self.client.post(f"{url}bulk/", items, format="json").status_code, 201)
+        self.assertEqual(self.comment_count(), 3)
+        comment = Comment.objects.get(name="A")
+        items = [{"id": comment.pk, "description": "changed"}]
+        self.assertEqual(self.client.patch(f"{url}bulk/", items, format="json").status_code, 200)
+        self.assertEqual(self.comment_count(), 3)
+        self.assertEqual(self.client.delete(f"{url}{comment.pk}/").status_code, 204)
+        self.assertEqual(self.comment_count(), 2)
+
+    def test_saving_does_not_overwrite_the_counters(self):
+        issue = self.create_issue()
+        stale_project, stale_issue = Project.objects.get(pk=self.project.pk), Issue.objects.get(pk=issue.pk)
+        Comment.objects.create(name="C", description="d", issue=issue, author=self.author)
+        stale_issue.description = "changed"
+        stale_issue.save()
+        stale_project.description = "changed"
+        stale_project.save()
+        issue.refresh_from_db()
+        self.project.refresh_from_db()
+        self.assertEqual((issue.description, issue.comment_count), ("changed", 1))
+        self.assertEqual((self.project.description, self.project.issue_count), ("changed", 1))
+
+    def test_repair_counters(self):
+        issue = self.create_issue()
+        Comment.objects.create(name="C", description="d", issue=issue, author=self.author)
+        Issue.objects.filter(pk=issue.pk).update(comment_count=7)
+        Project.objects.filter(pk=self.project.pk).update(issue_count=0)
+        output = StringIO()
+        call_command("repair_counters", stdout=output)
+        self.assertEqual(output.getvalue().strip(), "1 issues and 1 projects repaired.")
+        issue.refresh_from_db()
+        self.project.refresh_from_db()
+        self.assertEqual((issue.comment_count, self.project.issue_count), (1, 1))
+        self.assertEqual(repair_counters(), (0, 0))
+
+
+class ConditionalGetTests(ApiTestCase):
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get(self.issues_url())
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        response = self.client.get(self.issues_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_changed_list_is_sent_again(self):
+        etag = self.client.get(self.issues_url())["ETag"]
+        self.assertEqual(self.client.post(self.issues_url(), self.issue_data(), format="json").status_code, 201)
+        response = self.client.get(self.issues_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["count"], 1)
+
+    @override_settings(RESPONSE_CACHE={"ENABLED": True})
+    def test_list_etag_from_the_response_cache_version(self):
+        cache.clear()
+        etag = self.client.get(self.issues_url())["ETag"]
+        self.assertEqual(self.client.get(self.issues_url(), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.post(self.issues_url(), self.issue_data(), format="json").status_code, 201)
+        self.assertEqual(self.client.get(self.issues_url(), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_validators_do_not_read_the_whole_list(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(self.issues_url(), {"pagination": "cursor"}).status_code, 200)
+        self.assertFalse([query for query in captured if "MAX(" in query["sql"].upper()])
+        self.assertFalse([query for query in captured if "COUNT(" in query["sql"].upper()])
+
+    def test_malformed_detail_pk_is_not_found(self):
+        self.assertEqual(self.client.get(f"{self.issues_url()}abc/").status_code, 404)
+
+    def test_updated_detail_is_sent_again(self):
+        url = f"/api/projects/{self.project.pk}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.patch(url, {"description": "changed"}, format="json").status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": True}, PURGE={"BACKGROUND": False})
+class ResponseCacheTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create(username="other", email="other@example.com", age=30)
+        cls.project.contributors.add(cls.other)
+        cls.issue = Issue.objects.create(
+            name="Issue", description="d", tag=Issue.BUG, priority=Issue.LOW, project=cls.project,
+            author=cls.author, assignee=cls.author,
+        )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def comments_url(self):
+        return f"{self.issues_url()}{self.issue.pk}/comments/"
+
+    def assertCached(self, url, result):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Response-Cache"], result)
+        return response
+
+    def test_repeated_list_is_a_hit(self):
+        for url in ("/api/projects/", self.issues_url(), self.comments_url()):
+            with self.subTest(url=url):
+                first = self.assertCached(url, "miss")
+                self.assertEqual(self.assertCached(url, "hit").content, first.content)
+
+    def test_issue_write_is_a_miss(self):
+        self.assertCached(self.issues_url(), "miss")
+        self.assertEqual(self.client.post(self.issues_url(), self.issue_data(name="New"), format="json").status_code, 201)
+        self.assertEqual(self.assertCached(self.issues_url(), "miss").json()["count"], 2)
+        url = f"{self.issues_url()}{self.issue.pk}/"
+        self.assertEqual(self.client.patch(url, {"description": "changed"}, format="json").status_code, 200)
+        self.assertCached(self.issues_url(), "miss")
+
+    def test_comment_write_is_a_miss(self):
+        self.assertCached(self.comments_url(), "miss")
+        self.assertCached(self.issues_url(), "miss")
+        response = self.client.post(self.comments_url(), {"name": "C", "description": "d"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.assertCached(self.comments_url(), "miss").json()["count"], 1)
+        # comments_written() changed the comment_count of the issue.
+        issues = self.assertCached(self.issues_url(), "miss").json()["results"]
+        self.assertEqual(issues[0]["comment_count"], 1)
+
+    def test_contributor_write_is_a_miss(self):
+        self.assertCached("/api/projects/", "miss")
+        third = User.objects.create(username="third", email="third@example.com", age=30)
+        url = f"/api/projects/{self.project.pk}/contributors/"
+        self.assertEqual(self.client.post(url, {"user": third.pk}, format="json").status_code, 201)
+        self.assertCached("/api/projects/", "miss")
+        self.client.force_authenticate(third)
+        self.assertEqual(self.assertCached("/api/projects/", "miss").json()["count"], 1)
+
+    def test_project_purge_is_a_miss(self):
+        self.assertEqual(self.assertCached("/api/projects/", "miss").json()["count"], 1)
+        self.assertEqual(self.client.delete(f"/api/projects/{self.project.pk}/").status_code, 204)
+        self.assertEqual(self.assertCached("/api/projects/", "miss").json()["count"], 0)
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.assertCached("/api/projects/", "miss").json()["count"], 0)
+
+    def test_lists_are_shared_by_the_contributors_not_the_users(self):
+        self.assertCached(self.issues_url(), "miss")
+        self.assertCached("/api/projects/", "miss")
+        self.client.force_authenticate(self.other)
+        self.assertCached(self.issues_url(), "hit")
+        self.assertCached("/api/projects/", "miss")
+        self.assertCached("/api/projects/", "hit")
+
+
+@override_settings(PURGE={"BACKGROUND": False})
+class SearchTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.named = Issue.objects.create(
+            name="Crash at login", description="d", tag=Issue.BUG, priority=Issue.LOW, project=cls.project,
+            author=cls.author, assignee=cls.author,
+        )
+        cls.described = Issue.objects.create(
+            name="Login page", description="the page shows a crash", tag=Issue.BUG, priority=Issue.LOW,
+            project=cls.project, author=cls.author, assignee=cls.author,
+        )
+        cls.comment = Comment.objects.create(name="Note", description="same crash here", issue=cls.named,
+                                             author=cls.author)
+        cls.other_project = Project.objects.create(
+            name="Other", description="d", type=Project.BACKEND, author=cls.author
+        )
+        cls.other_project.contributors.add(cls.author)
+        cls.other_issue = Issue.objects.create(
+            name="Crash elsewhere", description="d", tag=Issue.BUG, priority=Issue.LOW, project=cls.other_project,
+            author=cls.author, assignee=cls.author,
+        )
+
+    def search(self, query, project=None):
+        response = self.client.get(f"/api/projects/{(project or self.project).pk}/search/", {"q": query})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(result["type"], result["id"]) for result in response.json()["results"]]
+
+    def comment_url(self):
+        return f"{self.issues_url()}{self.named.pk}/comments/{self.comment.pk}/"
+
+    def test_search_is_scoped_to_the_project(self):
+        self.assertCountEqual(
+            self.search("crash"), [("issue", self.named.pk), ("issue", self.described.pk), ("comment", self.comment.pk)]
+        )
+        self.assertEqual(self.search("crash", self.other_project), [("issue", self.other_issue.pk)])
+        self.assertEqual(self.search("elsewhere"), [])
+
+    def test_name_matches_rank_above_description_matches(self):
+        results = self.search("crash")
+        self.assertLess(results.index(("issue", self.named.pk)), results.index(("issue", self.described.pk)))
+
+    def test_updated_issue_and_comment_are_indexed_again(self):
+        url = f"{self.issues_url()}{self.described.pk}/"
+        self.assertEqual(self.client.patch(url, {"description": "a widget"}, format="json").status_code, 200)
+        self.assertNotIn(("issue", self.described.pk), self.search("crash"))
+        self.assertEqual(self.search("widget"), [("issue", self.described.pk)])
+        response = self.client.patch(self.comment_url(), {"description": "a gadget"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search("gadget"), [("comment", self.comment.pk)])
+        self.assertEqual(self.search("crash"), [("issue", self.named.pk)])
+
+    def test_deleted_comment_is_removed(self):
+        self.assertEqual(self.client.delete(self.comment_url()).status_code, 204)
+        self.assertNotIn(("comment", self.comment.pk), self.search("crash"))
+
+    def test_purged_issue_is_removed_with_its_comments(self):
+        self.assertEqual(self.client.delete(f"{self.issues_url()}{self.named.pk}/").status_code, 204)
+        self.assertEqual(self.search("crash"), [("issue", self.described.pk)])
+
+    def test_purged_project_is_removed(self):
+        self.assertEqual(self.client.delete(f"/api/projects/{self.project.pk}/").status_code, 204)
+        self.assertEqual(SearchResults(self.project.pk, "crash").count(), 0)
+        self.assertEqual(self.search("crash", self.other_project), [("issue", self.other_issue.pk)])
+
+    def test_query_without_terms(self):
+        url = f"/api/projects/{self.project.pk}/search/"
+        for query in ("", "   "):
+            with self.subTest(query=query):
+                response = self.client.get(url, {"q": query})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("q", response.json())
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.search("?!* -- \"'"), [])
+
+
+class ContributorBulkTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.contributor = User.objects.create(username="contributor", email="contributor@example.com", age=30)
+        cls.project.contributors.add(cls.contributor)
+        cls.user = User.objects.create(username="user", email="user@example.com", age=30)
+        cls.superuser = User.objects.create(username="admin", email="admin@example.com", age=30, is_superuser=True)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def bulk(self, add=(), remove=()):
+        url = f"/api/projects/{self.project.pk}/contributors/bulk/"
+        return self.client.post(url, {"add": list(add), "remove": list(remove)}, format="json")
+
+    def test_errors_by_user(self):
+        missing = self.superuser.pk + 1
+        response = self.bulk(add=[missing, self.superuser.pk, self.contributor.pk, self.user.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            "add": {
+                str(missing): "User does not exist!",
+                str(self.superuser.pk): "A Superuser cannot be added as contributor.",
+                str(self.contributor.pk): "This user is already a contributor of this project.",
+            },
+        })
+        # nothing is applied.
+        contributors = set(self.project.contributors.values_list("pk", flat=True))
+        self.assertEqual(contributors, {self.author.pk, self.contributor.pk})
+
+    def test_not_a_contributor_cannot_be_removed(self):
+        response = self.bulk(remove=[self.user.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"remove": {str(self.user.pk): "This user is not a contributor of this project."}}
+        )
+
+    def test_user_both_added_and_removed(self):
+        response = self.bulk(add=[self.user.pk], remove=[self.user.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"non_field_errors": ["A user cannot be both added and removed."]})
+
+    def test_added_and_removed_contributors(self):
+        response = self.bulk(add=[self.user.pk], remove=[self.contributor.pk])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["added"], [self.user.pk])
+        self.assertEqual(response.json()["removed"], [self.contributor.pk])
+        contributors = set(self.project.contributors.values_list("pk", flat=True))
+        self.assertEqual(contributors, {self.author.pk, self.user.pk})
+
+    def test_removed_contributor_loses_the_access(self):
+        self.client.force_authenticate(self.contributor)
+        self.assertEqual(self.client.get(self.issues_url()).status_code, 200)
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.bulk(add=[self.user.pk], remove=[self.contributor.pk]).status_code, 200)
+        self.client.force_authenticate(self.contributor)
+        self.assertEqual(self.client.get(self.issues_url()).status_code, 403)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(self.issues_url()).status_code, 200)
+
+
+class MembershipRevocationTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.contributor = User.objects.create(username="contributor", email="contributor@example.com", age=30)
+        cls.project.contributors.add(cls.contributor)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def assertRevoked(self):
+        self.client.force_authenticate(self.contributor)
+        self.assertEqual(self.client.get(self.issues_url()).status_code, 200)
+        self.client.force_authenticate(self.author)
+        url = f"/api/projects/{self.project.pk}/contributors/{self.contributor.pk}/"
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.client.force_authenticate(self.contributor)
+        self.assertEqual(self.client.get(self.issues_url()).status_code, 403)
+
+    def test_removed_contributor_loses_the_access(self):
+        self.assertRevoked()
+
+    @override_settings(MEMBERSHIP_CACHE={"CACHE_ALIAS": "default"})
+    def test_removed_contributor_loses_the_access_with_the_shared_cache(self):
+        self.assertRevoked()
+
+    def assertRoleReadBeforeRevocationIsNotCached(self):
+        read = membership.get_object_or_404
+
+        def read_then_revoke(*args, **kwargs):
+            # the contributor is removed between the read of the role and its caching.
+            project = read(*args, **kwargs)
+            self.project.contributors.remove(self.contributor)
+            return project
+
+        self.client.force_authenticate(self.contributor)
+        with mock.patch("api.membership.get_object_or_404", read_then_revoke):
+            self.client.get(self.issues_url())
+        self.assertEqual(self.client.get(self.issues_url()).status_code, 403)
+
+    @override_settings(MEMBERSHIP_CACHE={"CACHE_ALIAS": "default"})
+    def test_role_read_before_a_revocation_is_not_cached_in_the_shared_cache(self):
+        self.assertRoleReadBeforeRevocationIsNotCached()
+
+    @override_settings(MEMBERSHIP_CACHE={"LOCAL": True})
+    def test_role_read_before_a_revocation_is_not_cached_in_the_local_cache(self):
+        self.assertRoleReadBeforeRevocationIsNotCached()
+
+
+class MetricsTests(ApiTestCase):
+
+    def test_disabled_without_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(METRICS={"TOKEN": "secret"})
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"softdesk_http_requests_total", response.content)
+
+    def test_idle_worker_is_flushed(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS={"DIRECTORY": directory, "FLUSH_INTERVAL": 0.05}):
+            self.assertEqual(self.client.get(self.issues_url()).status_code, 200)
+            # no request follows: the file is written by the flusher thread.
+            deadline = time.monotonic() + 5
+            while not any(name.endswith(".json") for name in os.listdir(directory)):
+                self.assertLess(time.monotonic(), deadline, "the metrics were not flushed")
+                time.sleep(0.05)
+
+
+@override_settings(INSTRUMENTATION={"LOG": False}, RESPONSE_CACHE={"ENABLED": False}, PURGE={"CHUNK_SIZE": 2})
+class PurgeTests(APITransactionTestCase):
+    """
+    The purges run in background threads, which only see the committed rows.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create(username="author", email="author@example.com", age=30)
+        self.project = Project.objects.create(
+            name="Project", description="d", type=Project.BACKEND, author=self.author
+        )
+        self.project.contributors.add(self.author)
+        self.issues = [
+            Issue.objects.create(
+                name=f"Issue {index}", description="d", tag=Issue.BUG, priority=Issue.LOW, project=self.project,
+                author=self.author, assignee=self.author,
+            )
+            for index in range(2)
+        ]
+        for issue in self.issues:
+            for index in range(3):
+                Comment.objects.create(name=f"Comment {index}", description="d", issue=issue, author=self.author)
+        self.client.force_authenticate(self.author)
+
+    @staticmethod
+    def join_purges():
+        for thread in threading.enumerate():
+            if thread.name.startswith("purge-"):
+                thread.join(5)
+
+    def test_project_is_purged_in_background(self):
+        # the purge waits for the listing: SQLite's in-memory test database locks the tables it writes.
+        listed = threading.Event()
+
+        def in_thread(purge, instance):
+            listed.wait(5)
+            _in_thread(purge, instance)
+
+        with mock.patch("api.purge._in_thread", in_thread):
+            response = self.client.delete(f"/api/projects/{self.project.pk}/")
+            self.assertEqual(response.status_code, 204)
+            # detached at once: no longer listed.
+            self.assertEqual(self.client.get("/api/projects/").json()["count"], 0)
+            listed.set()
+            self.join_purges()
+        self.assertFalse(Project.objects.exists())
+        self.assertFalse(Issue.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_issue_is_purged_in_background(self):
+        issue, other = self.issues
+        self.assertEqual(Issue.objects.get(pk=issue.pk).comment_count, 3)
+        response = self.client.delete(f"/api/projects/{self.project.pk}/issues/{issue.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.join_purges()
+        self.assertEqual(list(Issue.objects.values_list("pk", flat=True)), [other.pk])
+        self.assertEqual(Comment.objects.filter(issue=other).count(), 3)
+        self.assertFalse(Comment.objects.filter(issue_id=issue.pk).exists())
+
+    def test_interrupted_project_purge_is_hidden_then_finished(self):
+        # the worker stops before the purge thread runs.
+        with mock.patch("api.purge._run_purge"):
+            self.assertEqual(self.client.delete(f"/api/projects/{self.project.pk}/").status_code, 204)
+        self.assertEqual(self.client.get("/api/projects/").json()["count"], 0)
+        self.assertEqual(self.client.get(f"/api/projects/{self.project.pk}/issues/").status_code, 404)
+        # the author cannot give the project contributors again.
+        other = User.objects.create(username="other", email="other@example.com", age=30)
+        response = self.client.post(f"/api/projects/{self.project.pk}/contributors/", {"user": other.pk}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Project.all_objects.filter(pk=self.project.pk).exists())
+
+        self.assertEqual(purge_pending(older_than=0), (1, 0))
+        self.assertFalse(Project.all_objects.exists())
+        self.assertFalse(Issue.all_objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_interrupted_issue_purge_is_hidden_then_finished(self):
+        issue, other = self.issues
+        url = f"/api/projects/{self.project.pk}/issues/{issue.pk}/"
+        with mock.patch("api.purge._run_purge"):
+            self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(f"{url}comments/").json()["count"], 0)
+        names = [item["name"] for item in self.client.get(f"/api/projects/{self.project.pk}/issues/").json()["results"]]
+        self.assertEqual(names, [other.name])
+        self.assertEqual(Project.objects.get(pk=self.project.pk).issue_count, 1)
+        # the issue being purged does not prevent creating it again.
+        data = {"name": issue.name, "description": "d", "tag": Issue.BUG, "priority": Issue.LOW,
+                "assignee": self.author.pk}
+        response = self.client.post(f"/api/projects/{self.project.pk}/issues/", data, format="json")
+        self.assertEqual(response.status_code, 201)
+        recreated = response.json()["id"]
+
+        self.assertEqual(purge_pending(older_than=0), (0, 1))
+        self.assertEqual(sorted(Issue.all_objects.values_list("pk", flat=True)), sorted([other.pk, recreated]))
+        self.assertFalse(Comment.objects.filter(issue_id=issue.pk).exists())
+        # uncounted once.
+        self.assertEqual(Project.objects.get(pk=self.project.pk).issue_count, 2)
+
+    def test_recent_purges_are_left_to_their_thread(self):
+        with mock.patch("api.purge._run_purge"):
+            self.client.delete(f"/api/projects/{self.project.pk}/")
+        self.assertEqual(purge_pending(older_than=600), (0, 0))
+
+    @override_settings(PURGE={"BACKGROUND": False})
+    def test_synchronous_purge(self):
+        response = self.client.delete(f"/api/projects/{self.project.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Issue.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+
+@override_settings(INSTRUMENTATION={"LOG": False}, PASSWORD_HASHING_ADMISSION={"CONCURRENCY": 1, "MAX_PENDING": 0})
+class PasswordAdmissionTests(APITestCase):
+
+    def signup(self, username):
+        return self.client.post("/api/signup/", {
+            "username": username, "password": "Signup-password-1", "email": f"{username}@example.com", "age": 30,
+            "contact_consent": False, "data_share_consent": False,
+        }, format="json")
+
+    def test_signup_is_hashed(self):
+        self.assertEqual(self.signup("first").status_code, 201)
+        self.assertTrue(User.objects.get(username="first").check_password("Signup-password-1"))
+
+    def test_signups_beyond_the_admission_are_refused(self):
+        admitted = _get_semaphores()[1]
+        admitted.acquire()
+        try:
+            self.assertEqual(self.signup("refused").status_code, 429)
+        finally:
+            admitted.release()
+        self.assertFalse(User.objects.filter(username="refused").exists())
+
+    def test_logins_beyond_the_admission_are_refused(self):
+        self.assertEqual(self.signup("login").status_code, 201)
+        credentials = {"username": "login", "password": "Signup-password-1"}
+        admitted = _get_semaphores()[1]
+        admitted.acquire()
+        try:
+            self.assertEqual(self.client.post("/api/login/", credentials, format="json").status_code, 429)
+        finally:
+            admitted.release()
+        response = self.client.post("/api/login/", credentials, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.data)
+
+
+class InstrumentationTests(ApiTestCase):
+
+    def test_server_timing_phases(self):
+        response = self.client.get(self.issues_url())
+        self.assertEqual(response.status_code, 200)
+        phases = dict(metric.split(";")[0:2] for metric in response["Server-Timing"].split(", "))
+        self.assertEqual(set(phases), {"total", "auth", "perm", "db", "ser"})
+
+    def test_serializer_class_is_untouched(self):
+        class BaseView:
+            def get_serializer(self, *args, **kwargs):
+                return IssueFilterSerializer(*args, **kwargs)
+
+            def get_paginated_response(self, data):
+                return data
+
+        class View(InstrumentedViewMixin, BaseView):
+            action = "list"
+
+        view = View()
+        with request_timings() as timings:
+            serializer = view.get_serializer(data={})
+            view.get_paginated_response({})
+        self.assertIs(type(serializer), IssueFilterSerializer)
+        self.assertGreater(timings.durations["ser"], 0)
@@ -4,6 +4,14 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from api.async_views import (
+    AsyncProjectListView,
+    AsyncProjectDetailView,
+    AsyncIssueListView,
+    AsyncIssueDetailView,
+    AsyncCommentListView,
+    AsyncCommentDetailView,
+)
 from api.views import (
     RegisterView,
     UserViewSet,
@@ -57,3 +65,18 @@ urlpatterns = [
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
+
+# Native async versions of the read-heavy endpoints, for the deployments under ASGI (config/asgi.py).
+# api/async/projects/... gives the same responses as api/projects/... with the page number pagination and
+# without conditional requests (see AsyncReadView).
+urlpatterns += [
+    path('async/projects/', AsyncProjectListView.as_view(), name='async-project-list'),
+    path('async/projects/<int:pk>/', AsyncProjectDetailView.as_view(), name='async-project-detail'),
+    path('async/projects/<int:project_pk>/issues/', AsyncIssueListView.as_view(), name='async-project-issue-list'),
+    path('async/projects/<int:project_pk>/issues/<int:pk>/', AsyncIssueDetailView.as_view(),
+         name='async-project-issue-detail'),
+    path('async/projects/<int:project_pk>/issues/<int:issue_pk>/comments/', AsyncCommentListView.as_view(),
+         name='async-issue-comment-list'),
+    path('async/projects/<int:project_pk>/issues/<int:issue_pk>/comments/<int:pk>/',
+         AsyncCommentDetailView.as_view(), name='async-issue-comment-detail'),
+]
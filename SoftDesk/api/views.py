@@ -1,8 +1,28 @@
 from django.conf import settings
 from api.permissions import IsAuthorOrReadOnly, IsProjectAuthor, IsProjectContributor, UserPermission
+from api.bulk import BulkActionMixin
+from api.conditional import ConditionalGetMixin
+from api.response_cache import ResponseCacheMixin, issue_scope, project_scope, user_scope
+from api.purge import purge_issue, purge_project
+from api.export import export_csv, export_ndjson
+from api.search import SearchResults
+from api.stats import count_issue_changes, counters_enabled, project_stats
+from api.counters import comments_written, issues_written
+from api.renderers import CSVRenderer, NDJSONRenderer
+from api.pagination import PaginationModeMixin
+from api.fieldsets import SparseFieldsetMixin
+from api.instrumentation import InstrumentedViewMixin
+from api.membership import ProjectMembershipMixin, invalidate_project_memberships
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from api.models import User, Project, Issue, Comment
+from django.db.models import Case, Count, OuterRef, Prefetch, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.viewsets import ModelViewSet
@@ -14,22 +34,30 @@ from api.serializers import (
     ProjectCreateSerializer,
     ProjectListSerializer,
     ProjectDetailSerializer,
+    ProjectListCountSerializer,
+    ProjectDetailCountSerializer,
 
     ContributorCreateSerializer,
+    ContributorBulkSerializer,
     ContributorListSerializer,
     ContributorDetailSerializer,
 
     IssueCreateSerializer,
+    IssueBulkSerializer,
+    IssueFilterSerializer,
     IssueListSerializer,
     IssueDetailSerializer,
 
     CommentCreateSerializer,
+    CommentBulkSerializer,
     CommentListSerializer,
-    CommentDetailSerializer
+    CommentDetailSerializer,
+
+    SearchResultSerializer
 )
 
 
-class RegisterView(generics.CreateAPIView):
+class RegisterView(InstrumentedViewMixin, generics.CreateAPIView):
     """
     ViewSet for creating Users.
     """
@@ -37,7 +65,7 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = []
 
 
-class UserViewSet(ModelViewSet):
+class UserViewSet(InstrumentedViewMixin, ModelViewSet):
     """
     ViewSet for viewing and editing Users.
     """
@@ -63,7 +91,8 @@ class UserViewSet(ModelViewSet):
         return User.objects.all().order_by("date_joined")
 
 
-class ProjectViewSet(ModelViewSet):
+class ProjectViewSet(InstrumentedViewMixin, ResponseCacheMixin, ConditionalGetMixin, PaginationModeMixin,
+                     SparseFieldsetMixin, ModelViewSet):
     """
     ViewSet for creating, viewing and editing Projects.
     """
@@ -84,7 +113,7 @@ class ProjectViewSet(ModelViewSet):
         # Else, _project will have a value and no database query will be performed.
         if self._project is None:
             # Project accessed only by its contributors - author is automatically a contributor.
-            self._project = Project.objects.filter(contributors=self.request.user)
+            self._project = Project.objects.filter(contributors=self.request.user.pk)
 
         return self._project
 
@@ -95,56 +124,134 @@ class ProjectViewSet(ModelViewSet):
         if self.action == 'create':
             return ProjectCreateSerializer
         elif self.action == 'list':
-            return ProjectListSerializer
+            return ProjectListCountSerializer if self.contributors_count_mode else ProjectListSerializer
         elif self.action == 'retrieve':
-            return ProjectDetailSerializer
+            return ProjectDetailCountSerializer if self.contributors_count_mode else ProjectDetailSerializer
         return ProjectCreateSerializer  # default serializer
 
+    @property
+    def contributors_count_mode(self):
+        """
+        With ?contributors=count, projects are displayed with their number of contributors
+        instead of the list of their ids, which is not loaded at all.
+        """
+        return self.request.query_params.get("contributors") == "count"
+
     def get_queryset(self):
+        queryset = self.project
+        if self.action in ("list", "retrieve"):
+            if self.contributors_count_mode:
+                # counted in a subquery, as a Count() would only count the joined logged-in user.
+                contributors = Project.contributors.through.objects.filter(project_id=OuterRef("pk"))
+                queryset = queryset.annotate(
+                    contributors_count=Coalesce(
+                        Subquery(
+                            contributors.order_by().values("project_id").annotate(count=Count("*")).values("count")
+                        ),
+                        0,
+                    )
+                )
+            elif self.wants_field("contributors"):
+                # the contributors ids of all the projects are loaded with one query.
+                queryset = queryset.prefetch_related(
+                    Prefetch("contributors", queryset=User.objects.only("id"))
+                )
         # use order_by to avoid the warning for the pagination
-        return self.project.order_by("created_time")
+        return queryset.order_by("created_time")
+
+    def get_conditional_queryset(self):
+        # without the contributors prefetch or count.
+        return self.project
+
+    def get_response_cache_scope(self):
+        # the projects list depends on the user.
+        return user_scope(self.request.user.pk), self.request.user.pk
 
     def perform_create(self, serializer):
         """
         Creation of a model instance.
         """
         # upon creation, the logged-in user is saved as author and as contributor.
-        serializer.save(author=self.request.user, contributors=[self.request.user])
+        # Ids are used, request.user being built from the token.
+        serializer.save(author_id=self.request.user.pk, contributors=[self.request.user.pk])
+
+    def perform_destroy(self, instance):
+        purge_project(instance)
 
     def destroy(self, request, *args, **kwargs):
         """
        Deletion of Project model instance
         """
+        instance = self.get_object()
+        self.perform_destroy(instance)
         return Response(
             {"status": "The project has been successfully deleted."},
             status=204
         )
 
+    # number of issues fetched at once by the exports.
+    export_chunk_size = 500
+
+    @action(detail=True, methods=["get"], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, *args, **kwargs):
+        """
+        Streams all the issues of the project with their comments,
+        as NDJSON (default, or ?format=ndjson) or as CSV (?format=csv).
+        """
+        project = self.get_object()
+        if request.accepted_renderer.format == CSVRenderer.format:
+            rows = export_csv(project, self.export_chunk_size)
+        else:
+            rows = export_ndjson(project, self.export_chunk_size)
+
+        response = StreamingHttpResponse(rows, content_type=request.accepted_renderer.media_type)
+        filename = f"project-{project.pk}.{request.accepted_renderer.format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=True, methods=["get"])
+    def stats(self, request, *args, **kwargs):
+        """
+        Numbers of issues of the project by state, priority, tag and assignee,
+        computed with one aggregation query or read from the issue counters (see api/stats.py).
+        """
+        project = self.get_object()
+        return Response(project_stats(project.pk))
+
+    @action(detail=True, methods=["get"])
+    def search(self, request, *args, **kwargs):
+        """
+        Searches the names and descriptions of the project's issues and comments: ?q=terms.
+        Results are ranked by relevance and paginated, using the search index (see api/search.py).
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise serializers.ValidationError({"q": ["This field is required."]})
+        project = self.get_object()
 
-class ContributorViewSet(ModelViewSet):
+        # the results are not ordered by creation time: the page number pagination is always used.
+        paginator = api_settings.DEFAULT_PAGINATION_CLASS()
+        page = paginator.paginate_queryset(SearchResults(project.pk, query), request, view=self)
+        serializer = SearchResultSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ContributorViewSet(InstrumentedViewMixin, ProjectMembershipMixin, ModelViewSet):
     """
     A ViewSet for adding, viewing and adding project contributors.
     """
 
     permission_classes = [IsProjectAuthor]
 
-    # The _project variable is created to avoid unnecessary database queries.
-    _project = None
-
     @property
     def project(self):
         """create an attribute project inside the ContributorViewSet.
         This attribute is available in the view and can be called/available in the serializer.
         """
 
-        # if the view was never executed before, we will make the database query;
-        # otherwise, _project will have a value and no database query will be performed.
-        if self._project is None:
-            self._project = get_object_or_404(
-                Project.objects.all().prefetch_related("contributors"),
-                pk=self.kwargs["project_pk"],
-            )
-        return self._project
+        # The project is fetched once per request by the membership resolver,
+        # already used by the IsProjectAuthor permission.
+        return self.membership.project
 
     def get_queryset(self):
         # Returns contributors ordered by 'date_joined' to avoid the pagination warning.
@@ -160,11 +267,14 @@ class ContributorViewSet(ModelViewSet):
             return ContributorListSerializer
         elif self.action == 'retrieve':
             return ContributorDetailSerializer
+        elif self.action == 'bulk':
+            return ContributorBulkSerializer
         return ContributorCreateSerializer  # default serializer
 
     # adds a contributor
     def perform_create(self, serializer):
         self.project.contributors.add(serializer.validated_data["user"])
+        invalidate_project_memberships(self.project.pk)
 
     # override create method to return a response message
     def create(self, request, *args, **kwargs):
@@ -179,6 +289,7 @@ class ContributorViewSet(ModelViewSet):
     # removes a contributor
     def perform_destroy(self, instance):
         self.project.contributors.remove(instance)
+        invalidate_project_memberships(self.project.pk)
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -188,8 +299,53 @@ class ContributorViewSet(ModelViewSet):
             status=204
         )
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request, *args, **kwargs):
+        """
+        Adds and removes a list of contributors: {"add": [user ids], "remove": [user ids]}.
+        Each change is applied with a single m2m operation.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        added, removed = serializer.validated_data["add"], serializer.validated_data["remove"]
+        with transaction.atomic():
+            if added:
+                self.project.contributors.add(*added)
+            if removed:
+                self.project.contributors.remove(*removed)
+        invalidate_project_memberships(self.project.pk)
+        return Response(
+            {"status": "The contributors have been successfully updated.", "added": added, "removed": removed},
+            status=200
+        )
+
+
+# rank of the priorities, from the lowest to the highest.
+PRIORITY_RANK = Case(
+    When(priority=Issue.LOW, then=Value(0)),
+    When(priority=Issue.MEDIUM, then=Value(1)),
+    default=Value(2),
+)
+
 
-class IssueViewSet(ModelViewSet):
+def filter_issues(queryset, issue_filters):
+    """
+    Filters and orders the issues with the query parameters validated by IssueFilterSerializer.
+    """
+    filters = dict(issue_filters)
+    ordering = filters.pop("ordering")
+    # each filter is backed by an index on the project, the field and the creation time.
+    queryset = queryset.filter(**filters)
+    descending = ordering.startswith("-")
+    time_ordering = ("-created_time", "-id") if descending else ("created_time", "id")
+    if ordering.lstrip("-") == "priority":
+        rank = PRIORITY_RANK.desc() if descending else PRIORITY_RANK.asc()
+        return queryset.order_by(rank, *time_ordering)
+    return queryset.order_by(*time_ordering)
+
+
+class IssueViewSet(InstrumentedViewMixin, ResponseCacheMixin, ConditionalGetMixin, BulkActionMixin,
+                   PaginationModeMixin, SparseFieldsetMixin, ProjectMembershipMixin, ModelViewSet):
     """
     ViewSet for creating, viewing and editing Issues in a Project.
     """
@@ -204,8 +360,38 @@ class IssueViewSet(ModelViewSet):
 
         return self._issue
 
+    _issue_filters = None
+
+    @property
+    def issue_filters(self):
+        """
+        Filters and ordering of the issues list, validated against the choices of the Issue fields:
+        ?state=, ?priority=, ?tag=, ?assignee=, ?author= and ?ordering=(-)created_time or (-)priority.
+        """
+        if self._issue_filters is None:
+            serializer = IssueFilterSerializer(data=self.request.query_params)
+            serializer.is_valid(raise_exception=True)
+            self._issue_filters = serializer.validated_data
+        return self._issue_filters
+
+    def get_cursor_ordering(self):
+        if self.issue_filters["ordering"].lstrip("-") == "priority":
+            raise serializers.ValidationError(
+                {"ordering": ["The cursor pagination can only order by created_time or -created_time."]}
+            )
+        if self.issue_filters["ordering"].startswith("-"):
+            return "-created_time", "-id"
+        return super().get_cursor_ordering()
+
     def get_queryset(self):
-        return self.issue.order_by("created_time")
+        if self.action != "list":
+            return self.issue.order_by("created_time")
+
+        return filter_issues(self.issue, self.issue_filters)
+
+    def get_response_cache_scope(self):
+        # all the contributors, checked by IsProjectContributor, share the same issues list.
+        return project_scope(self.kwargs["project_pk"]), "contributor"
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -219,21 +405,65 @@ class IssueViewSet(ModelViewSet):
     # upon creation of an issue, save the logged-in user as author and assignee.
     def perform_create(self, serializer):
         selected_assignee = serializer.validated_data["assignee"]
-        project_pk = self.kwargs["project_pk"]
-        project = get_object_or_404(Project, id=project_pk)
-        serializer.save(author=self.request.user, assignee=selected_assignee, project=project)
+        # project already checked by the IsProjectContributor permission.
+        project_pk = self.membership.project_pk
+        serializer.save(author_id=self.request.user.pk, assignee=selected_assignee, project_id=project_pk)
+
+    bulk_serializer_class = IssueBulkSerializer
+
+    def get_bulk_lookup_errors(self, items, instances=None):
+        """
+        Checks the assignees and, on creation, the duplicates of all the issues with two queries.
+        """
+        errors = {}
+        assignee_ids = {attrs["assignee_id"] for attrs in items.values() if "assignee_id" in attrs}
+        existing_users = set(User.objects.filter(pk__in=assignee_ids).values_list("pk", flat=True))
+
+        existing_issues = set()
+        if instances is None:
+            # duplicates are checked against the project's issues and the other items of the list.
+            existing_issues = set(
+                self.issue.filter(name__in={attrs["name"] for attrs in items.values()})
+                .values_list("name", "tag", "state", "priority")
+            )
+
+        for index, attrs in items.items():
+            if "assignee_id" in attrs and attrs["assignee_id"] not in existing_users:
+                errors[index] = {"assignee": [f'Invalid pk "{attrs["assignee_id"]}" - object does not exist.']}
+            elif instances is None:
+                key = (attrs["name"], attrs["tag"], attrs.get("state", Issue.TODO), attrs["priority"])
+                if key in existing_issues:
+                    errors[index] = {api_settings.NON_FIELD_ERRORS_KEY: ["This issue exists already!"]}
+                existing_issues.add(key)
+        return errors
+
+    def build_bulk_instance(self, attrs):
+        return Issue(**attrs, project_id=self.membership.project_pk, author_id=self.request.user.pk)
+
+    def bulk_written(self, instances, fields=None):
+        super().bulk_written(instances, fields)
+        if fields is None:
+            issues_written(self.membership.project_pk, len(instances))
+        if counters_enabled():
+            count_issue_changes(instances)
+
+    def perform_destroy(self, instance):
+        purge_issue(instance)
 
     def destroy(self, request, *args, **kwargs):
         """
        Deletion of Issue model instance
         """
+        instance = self.get_object()
+        self.perform_destroy(instance)
         return Response(
             {"status": "The issue has been successfully deleted."},
             status=204
         )
 
 
-class CommentViewSet(ModelViewSet):
+class CommentViewSet(InstrumentedViewMixin, ResponseCacheMixin, ConditionalGetMixin, BulkActionMixin,
+                     PaginationModeMixin, SparseFieldsetMixin, ProjectMembershipMixin, ModelViewSet):
     """
     ViewSet for creating, viewing and editing Comments made in an Issue.
     """
@@ -244,13 +474,21 @@ class CommentViewSet(ModelViewSet):
     @property
     def comment(self):
         if self._comment is None:
-            self._comment = Comment.objects.filter(issue_id=self.kwargs["issue_pk"])
+            # only the comments of a live issue of the project checked by IsProjectContributor.
+            self._comment = Comment.objects.filter(
+                issue_id=self.kwargs["issue_pk"], issue__project_id=self.kwargs["project_pk"],
+                issue__deleted_time__isnull=True,
+            )
 
         return self._comment
 
     def get_queryset(self):
         return self.comment.order_by("created_time")
 
+    def get_response_cache_scope(self):
+        # all the contributors, checked by IsProjectContributor, share the same comments list.
+        return issue_scope(self.kwargs["issue_pk"]), "contributor"
+
     def get_serializer_class(self):
         """
         Return the class to use for the serializer.
@@ -267,16 +505,52 @@ class CommentViewSet(ModelViewSet):
     def perform_create(self, serializer):
         project_pk = self.kwargs["project_pk"]
         issue_pk = self.kwargs["issue_pk"]
-        issue = get_object_or_404(Issue, id=issue_pk)
+        issue = get_object_or_404(Issue.objects.only("id"), id=issue_pk, project_id=self.membership.project_pk)
+        issue_url = f"{settings.BASE_URL}/api/projects/{project_pk}/issues/{issue_pk}/"
+
+        author_pk = self.request.user.pk
+        serializer.save(author_id=author_pk, issue_id=issue.pk, issue_url=issue_url)
+
+    bulk_serializer_class = CommentBulkSerializer
+
+    _bulk_issue = None
+
+    def get_bulk_lookup_errors(self, items, instances=None):
+        """
+        Checks, on creation, the duplicate names of all the comments with one query.
+        """
+        errors = {}
+        if instances is None:
+            # raises a 404 if the issue is not in the project.
+            self._bulk_issue = get_object_or_404(
+                Issue.objects.only("id"), id=self.kwargs["issue_pk"], project_id=self.membership.project_pk
+            )
+            existing_names = set(
+                self.comment.filter(name__in={attrs["name"] for attrs in items.values()})
+                .values_list("name", flat=True)
+            )
+            for index, attrs in items.items():
+                if attrs["name"] in existing_names:
+                    errors[index] = {"name": ["This comment name exists already."]}
+                existing_names.add(attrs["name"])
+        return errors
+
+    def build_bulk_instance(self, attrs):
+        project_pk = self.kwargs["project_pk"]
+        issue_pk = self.kwargs["issue_pk"]
         issue_url = f"{settings.BASE_URL}/api/projects/{project_pk}/issues/{issue_pk}/"
+        return Comment(**attrs, issue=self._bulk_issue, author_id=self.request.user.pk, issue_url=issue_url)
 
-        author = self.request.user
-        serializer.save(author=author, issue=issue, issue_url=issue_url)
+    def bulk_written(self, instances, fields=None):
+        super().bulk_written(instances, fields)
+        comments_written(self.kwargs["issue_pk"], len(instances) if fields is None else 0)
 
     def destroy(self, request, *args, **kwargs):
         """
        Deletion of Comment model instance
         """
+        instance = self.get_object()
+        self.perform_destroy(instance)
         return Response(
             {"status": "The comment has been successfully deleted."},
             status=204
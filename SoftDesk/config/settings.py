@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -49,6 +50,9 @@ PROJECT_APPS = [
 INSTALLED_APPS = DJANGO_CORE_APPS + THIRD_PARTY_APPS + PROJECT_APPS
 
 MIDDLEWARE = [
+    # first, so that the measured total time includes the other middlewares.
+    'api.instrumentation.ServerTimingMiddleware',
+    'api.profiling.SlowRequestProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,11 +85,52 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_PROFILE selects the database: sqlite (default) or postgresql.
+# Connections are kept open between requests for DATABASE_CONN_MAX_AGE seconds (0: one connection per request),
+# and checked before being reused.
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
+if DATABASE_PROFILE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'softdesk'),
+            'USER': os.environ.get('POSTGRES_USER', 'softdesk'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            # .iterator() (exports, search index rebuilds) streams the rows with server-side cursors.
+            # Behind PgBouncer in transaction pooling mode (POSTGRES_PGBOUNCER=1), they must be disabled.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('POSTGRES_PGBOUNCER', '') == '1',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH') or BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+
+# Pragmas set on each new SQLite connection (api/database.py).
+# The journal mode is persisted in the database file: it is only changed when SQLITE_JOURNAL_MODE is set,
+# e.g. to WAL, so that writers do not block readers. synchronous=NORMAL is only safe in WAL mode.
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or None
+
+SQLITE_PRAGMAS = {
+    'journal_mode': SQLITE_JOURNAL_MODE,
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS') or (
+        'NORMAL' if (SQLITE_JOURNAL_MODE or '').upper() == 'WAL' else None
+    ),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'temp_store': 'MEMORY',
 }
 
 # Password validation
@@ -106,6 +151,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+# The first hasher hashes the new passwords; the passwords hashed with another hasher, or with other costs,
+# are rehashed at login. PASSWORD_HASHER is scrypt (default), argon2 (requires argon2-cffi) or pbkdf2.
+
+PASSWORD_HASHERS_BY_NAME = {
+    'scrypt': 'api.hashers.TunableScryptPasswordHasher',
+    'argon2': 'api.hashers.TunableArgon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'scrypt')
+PASSWORD_HASHERS = [PASSWORD_HASHERS_BY_NAME[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHERS_BY_NAME.items() if name != PASSWORD_HASHER
+]
+
+PASSWORD_HASHING = {
+    'SCRYPT_WORK_FACTOR': int(os.environ.get('SCRYPT_WORK_FACTOR', 2 ** 14)),
+    'ARGON2_TIME_COST': int(os.environ.get('ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('ARGON2_MEMORY_COST', 65536)),
+    'ARGON2_PARALLELISM': int(os.environ.get('ARGON2_PARALLELISM', 1)),
+}
+
+# Admission control of the password hashes of the signups, account updates and logins (api/password_admission.py):
+# at most CONCURRENCY hashes at once (None: the number of CPUs), MAX_PENDING waiting, the next ones refused (429).
+PASSWORD_HASHING_ADMISSION = {
+    'CONCURRENCY': None,
+    'MAX_PENDING': 64,
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -140,8 +214,10 @@ LOGIN_REDIRECT_URL = 'api/projects'
 
 REST_FRAMEWORK = {
 
+    # Stateless variant of rest_framework_simplejwt.authentication.JWTAuthentication:
+    # request.user is built from the token claims, without a database query.
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessJWTAuthentication',
     ],
 
     # Pagination ENABLED - allows to control how many objects per page are returned.
@@ -152,5 +228,96 @@ REST_FRAMEWORK = {
 # custom Simple JWT settings variables
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
-    "REFRESH_TOKEN_LIFETIME": timedelta(days=7)
+    "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    # adds the username and the superuser status to the tokens claims.
+    "TOKEN_OBTAIN_SERIALIZER": "api.serializers.ClaimsTokenObtainPairSerializer",
+}
+
+# In-process cache of the authenticated users. When disabled, request.user is built from the token claims.
+JWT_USER_CACHE = {
+    "ENABLED": False,
+    "MAX_ENTRIES": 10000,
+    "TIMEOUT": 30,
+}
+
+# Cross-request cache of the users' roles in projects, used by the project permissions.
+# Only enabled with MEMBERSHIP_CACHE_ALIAS, the name of a cache in CACHES shared by every worker (e.g. Redis),
+# so that a removed contributor loses the access in every worker at once.
+MEMBERSHIP_CACHE = {
+    "ENABLED": True,
+    "CACHE_ALIAS": os.environ.get("MEMBERSHIP_CACHE_ALIAS") or None,
+    "TIMEOUT": 60,
+}
+
+# Caches - local memory by default. In production, use a cache shared by the workers, e.g.
+# 'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache of the rendered projects, issues and comments lists, invalidated on every write.
+RESPONSE_CACHE = {
+    "ENABLED": True,
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
+# Deletion of projects and issues: their issues and comments are deleted by chunks of raw DELETE statements.
+# The contents of a deleted project, and the comments of a deleted issue with more than CHUNK_SIZE of them,
+# are purged after the response, in a background thread. PURGE_BACKGROUND=0 purges them in the request.
+# They are marked as deleted until then: `python manage.py purge_pending` finishes the interrupted purges.
+PURGE = {
+    "CHUNK_SIZE": 500,
+    "BACKGROUND": os.environ.get("PURGE_BACKGROUND", "1") == "1",
+}
+
+# Statistics of the projects' issues (/api/projects/{id}/stats/): computed with one aggregation query,
+# or with COUNTERS, read from a table of counters updated on every issue write.
+# After enabling COUNTERS on an existing database, run: python manage.py rebuild_issue_counters
+ISSUE_STATS = {
+    "COUNTERS": os.environ.get("ISSUE_STATS_COUNTERS", "") == "1",
+}
+
+# Instrumentation of the api views: Server-Timing header (total, auth, perm, db, ser), JSON log line
+# and in-process rolling histogram of each route (api.instrumentation.route_histograms()).
+INSTRUMENTATION = {
+    "ENABLED": True,
+    "SERVER_TIMING": True,
+    "LOG": os.environ.get("INSTRUMENTATION_LOG", "1") == "1",
+    "WINDOW": 1000,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api.instrumentation": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# Profiler of the slow api requests: SAMPLE_RATE of the requests are profiled with cProfile, and a report is
+# written for the ones slower than THRESHOLD_MS, in a ring of MAX_REPORTS files.
+# List and summarize the reports with: python manage.py profile_reports
+PROFILING = {
+    "ENABLED": os.environ.get("PROFILING", "") == "1",
+    "SAMPLE_RATE": float(os.environ.get("PROFILING_SAMPLE_RATE", 0.01)),
+    "THRESHOLD_MS": float(os.environ.get("PROFILING_THRESHOLD_MS", 500)),
+    "DIRECTORY": os.environ.get("PROFILING_DIRECTORY") or None,
+    "MAX_REPORTS": 200,
+}
+
+# Prometheus metrics of the API, served at /metrics to the requests with an "Authorization: Bearer <METRICS_TOKEN>"
+# header; without METRICS_TOKEN, /metrics answers 404. With several worker processes, set METRICS_DIRECTORY
+# to a directory emptied when the server starts: each worker writes its metrics there, /metrics adds them up.
+METRICS = {
+    "ENABLED": True,
+    "DIRECTORY": os.environ.get("METRICS_DIRECTORY") or None,
+    "FLUSH_INTERVAL": 1.0,
+    "TOKEN": os.environ.get("METRICS_TOKEN") or None,
 }